@@ -0,0 +1,326 @@
+"""
+ParaSearch Result Cache
+LRU + TTL cache for generated search results, with optional SQLite persistence
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from shared_state import connect_sqlite, write_behind
+
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Fold Unicode form, case and whitespace, and drop trailing sentence
+    punctuation. Symbols inside the query are kept, so "C++" and "C#"
+    stay distinct.
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = _TRAILING_PUNCTUATION.sub("", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def make_cache_key(query: str, model: str, num_results: int, temperature: float,
+                   lightweight: bool = False) -> str:
+    """Cache key for a search: normalized query plus generation settings"""
+    key = f"{normalize_query(query)}|{model}|{num_results}|{temperature:.2f}"
+    return key + "|light" if lightweight else key
+
+
+def make_expansion_key(query: str, model: str, title: str, snippet: str) -> str:
+    """
+    Cache key for the expanded text of one result. The snippet comes from
+    the client and goes into the prompt, so it is part of the key: a
+    request with a made-up snippet can't fill the entry others are served.
+    """
+    digest = hashlib.sha256(" ".join(snippet.split()).encode()).hexdigest()[:16]
+    return f"expand|{normalize_query(query)}|{model}|{normalize_query(title)}|{digest}"
+
+
+class SQLiteCacheStore:
+    """
+    On-disk cache tier so cached results survive restarts. The database
+    runs in WAL mode, so several worker processes can share it.
+
+    Reads go through their own read-only connection and lock, so a
+    lookup on the event loop never waits behind a write (which may be
+    waiting on another worker's lock). Expired rows found by a lookup
+    are deleted with write_behind().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+        self._reader = connect_sqlite(path)
+        self._reader.execute("PRAGMA query_only=ON")
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Return (value, expires_at) for key, or None if missing or expired"""
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            write_behind(self.delete_expired, key)
+            return None
+        return row
+
+    def delete_expired(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache WHERE key = ? AND expires_at < ?", (key, time.time()))
+            self._conn.commit()
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._conn.commit()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._read_lock:
+            self._reader.close()
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    In-memory LRU cache with TTL expiry and a byte budget.
+
+    Values are stored as JSON text so the memory cap is measurable and
+    cache hits hand back fresh objects that callers are free to mutate.
+    When a SQLite store is configured, misses fall through to disk and
+    disk hits are promoted back into memory.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int,
+                 store: Optional[SQLiteCacheStore] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    def _insert(self, key: str, value: str, expires_at: float):
+        if key in self._entries:
+            self._remove(key)
+        if len(value) > self.max_bytes:
+            return
+        self._entries[key] = (value, expires_at)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """Return the cached results for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(value)
+            self._remove(key)
+            self.expirations += 1
+
+        if self.store is not None:
+            row = self.store.get(key)
+            if row is not None:
+                value, expires_at = row
+                self._insert(key, value, expires_at)
+                self.hits += 1
+                self.disk_hits += 1
+                return json.loads(value)
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, results: List[Dict]):
+        value = json.dumps(results)
+        expires_at = time.time() + self.ttl
+        self._insert(key, value, expires_at)
+        if self.store is not None:
+            write_behind(self.store.set, key, value, expires_at)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "persistent": self.store is not None
+        }
+
+
+class ExpiringStore:
+    """Bounded LRU + TTL store of values held in this process only"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] >= time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        self._entries.pop(key, None)
+        self._entries[key] = (value, time.time() + self.ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+class ContextStore(ExpiringStore):
+    """
+    Ollama generation contexts (the token ids a finished generation
+    returns), so a follow-up request can continue it. Contexts are held
+    as compact int arrays.
+    """
+
+    def get(self, key: str) -> Optional[List[int]]:
+        context = super().get(key)
+        return None if context is None else context.tolist()
+
+    def set(self, key: str, context: List[int]):
+        super().set(key, array("l", context))
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats["tokens"] = sum(len(context) for context, _ in self._entries.values())
+        return stats
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight task.
+
+    Every caller awaits the same task through asyncio.shield, so a caller
+    that disconnects only stops waiting. The shared task is cancelled
+    once the last waiter has gone, so abandoned generations stop early.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, list] = {}  # key -> [task, waiter count]
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.create_task(fn())
+            flight = [task, 0]
+            self._flights[key] = flight
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        task = flight[0]
+        flight[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not task.done():
+                # Forget the flight first, so a caller arriving while the
+                # task winds down starts a fresh one rather than joining it
+                self._forget(key, task)
+                task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        flight = self._flights.get(key)
+        if flight is not None and flight[0] is task:
+            del self._flights[key]
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned
+        }
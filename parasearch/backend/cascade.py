@@ -0,0 +1,68 @@
+"""
+ParaSearch Model Cascade
+Decides when a search answered by a small model is re-run on a larger one
+"""
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+RISK_LEVELS = ("low", "medium", "high")
+
+
+def risk_at_least(risk: str, level: str) -> bool:
+    return RISK_LEVELS.index(risk) >= RISK_LEVELS.index(level)
+
+
+class CascadePolicy:
+    """
+    Tiers are models ordered from smallest to largest. A search starts on
+    the first tier and moves to the next one while its answer looks
+    unreliable: average confidence below min_confidence, or a result whose
+    hallucination risk reaches escalate_risk. A query whose own risk
+    level reaches escalate_risk starts on the last tier, since the smaller
+    ones would be re-run anyway.
+    """
+
+    def __init__(self, models: Sequence[str], min_confidence: float = 0.6, escalate_risk: str = "high"):
+        if escalate_risk not in RISK_LEVELS:
+            raise ValueError(f"escalate_risk must be one of {RISK_LEVELS}, got {escalate_risk!r}")
+        self.models = list(models)
+        self.min_confidence = min_confidence
+        self.escalate_risk = escalate_risk
+        self.searches = 0
+        self.answered: Counter = Counter()                           # model -> searches it answered
+        self.escalations: Dict[str, Counter] = defaultdict(Counter)  # model -> reason -> count
+
+    def first_tier(self, risk_analysis: dict) -> int:
+        """Tier a search starts on, given analyze_query_risk() for its query"""
+        if risk_at_least(risk_analysis['risk_level'], self.escalate_risk):
+            return len(self.models) - 1
+        return 0
+
+    def escalation_reason(self, confidences: List[float], risks: List[str]) -> Optional[str]:
+        """Why an answer should go to the next tier, or None to accept it"""
+        if not confidences:
+            return "no_results"
+        if sum(confidences) / len(confidences) < self.min_confidence:
+            return "low_confidence"
+        if any(risk_at_least(risk, self.escalate_risk) for risk in risks):
+            return "hallucination_risk"
+        return None
+
+    def record(self, answered_by: str, escalations: List[tuple]):
+        """Count one finished search: the model that answered and each (model, reason) it escalated past"""
+        self.searches += 1
+        self.answered[answered_by] += 1
+        for model, reason in escalations:
+            self.escalations[model][reason] += 1
+
+    def stats(self) -> Dict:
+        escalated = self.searches - self.answered[self.models[0]] if self.models else 0
+        return {
+            "models": self.models,
+            "min_confidence": self.min_confidence,
+            "escalate_risk": self.escalate_risk,
+            "searches": self.searches,
+            "escalation_rate": round(escalated / self.searches, 3) if self.searches else 0.0,
+            "answered_by": {model: self.answered[model] for model in self.models},
+            "escalations": {model: dict(reasons) for model, reasons in self.escalations.items()}
+        }
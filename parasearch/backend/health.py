@@ -0,0 +1,136 @@
+"""
+ParaSearch Health Monitoring
+Background Ollama health polling and a circuit breaker for generation calls
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class HealthMonitor:
+    """
+    Polls Ollama on an interval and keeps the latest health and model
+    snapshot, so request handlers never probe Ollama on the hot path.
+    """
+
+    def __init__(self, probe: Callable[[], Awaitable[Dict]], interval: float):
+        self.probe = probe
+        self.interval = interval
+        self.snapshot: Dict = {"status": "unknown", "error": "Health not checked yet"}
+        self.checked_at: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.snapshot.get("status") == "healthy"
+
+    @property
+    def models(self) -> list:
+        """Model names from the last successful /api/tags poll"""
+        if not self.healthy:
+            return []
+        return [m["name"] for m in self.snapshot.get("models", {}).get("models", [])]
+
+    async def refresh(self) -> Dict:
+        """Probe Ollama once and store the result"""
+        self.snapshot = await self.probe()
+        self.checked_at = datetime.now().isoformat()
+        return self.snapshot
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.snapshot = {"status": "unhealthy", "error": str(e)}
+
+    async def start(self):
+        """Take an initial snapshot, then keep polling in the background"""
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict:
+        return {**self.snapshot, "checked_at": self.checked_at}
+
+
+class CircuitBreaker:
+    """
+    Fails fast after consecutive generation failures.
+
+    closed    - requests flow normally
+    open      - requests are rejected until reset_timeout has passed
+    half_open - a single trial request is let through; success closes
+                the circuit, failure opens it again
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def ready(self) -> bool:
+        """Whether allow_request() would let a request through, without reserving it"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self._trial_in_flight
+
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._trial_in_flight = False
+        # half_open: only one trial request at a time
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Forget an abandoned trial request (e.g. the client disconnected)"""
+        self._trial_in_flight = False
+
+    def retry_after(self) -> int:
+        """Seconds until the circuit will let a trial request through"""
+        if self.state != "open":
+            return 1
+        remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+        return max(1, int(remaining + 0.999))
+
+    def status(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout
+        }
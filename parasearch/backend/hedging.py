@@ -0,0 +1,81 @@
+"""
+ParaSearch Hedging Policy
+Decides when a slow generation gets a backup request on another backend
+"""
+import math
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+
+class HedgePolicy:
+    """
+    Tracks recent time-to-first-token per model. A generation that has not
+    produced its first chunk within the chosen percentile of those times
+    is worth hedging, as long as hedges stay under max_fraction of recent
+    generations. Until min_samples timings exist for a model it is never
+    hedged, since there is no threshold to compare against.
+
+    allow() reserves the hedge it grants until record() counts its race,
+    so concurrent generations can't all pass the check at once.
+    """
+
+    def __init__(self, percentile: float = 0.9, max_fraction: float = 0.1,
+                 min_samples: int = 20, window: int = 200):
+        self.percentile = min(1.0, max(0.0, percentile))
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self._samples: Dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        # One entry per recent generation: whether it was hedged
+        self._recent: deque = deque(maxlen=window)
+        self._in_flight = 0  # hedges granted by allow() and not yet recorded
+        self.generations = 0
+        self.hedged = 0
+        self.backup_wins = 0
+
+    def delay(self, model: str) -> Optional[float]:
+        """Seconds to wait for the first chunk before hedging, or None to not hedge"""
+        samples = self._samples[model]
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+
+    def allow(self) -> bool:
+        """
+        Whether another hedge stays within max_fraction of recent
+        generations, counting hedges still running. If so, the hedge is
+        reserved; the caller must record() the race once it ends.
+        """
+        hedges = sum(self._recent) + self._in_flight + 1
+        if hedges > self.max_fraction * (len(self._recent) + self._in_flight + 1):
+            return False
+        self._in_flight += 1
+        return True
+
+    def observe(self, model: str, first_chunk_seconds: float):
+        self._samples[model].append(first_chunk_seconds)
+
+    def record(self, hedged: bool, backup_won: bool = False):
+        """Count one finished race, hedged or not, releasing its reserved hedge"""
+        if hedged:
+            self._in_flight = max(0, self._in_flight - 1)
+        self._recent.append(hedged)
+        self.generations += 1
+        self.hedged += hedged
+        self.backup_wins += backup_won
+
+    def stats(self) -> Dict:
+        return {
+            "percentile": self.percentile,
+            "max_fraction": self.max_fraction,
+            "generations": self.generations,
+            "hedged": self.hedged,
+            "backup_wins": self.backup_wins,
+            "hedges_in_flight": self._in_flight,
+            "recent_hedge_fraction": round(sum(self._recent) / len(self._recent), 3) if self._recent else 0.0,
+            "thresholds": {
+                model: round(delay, 3)
+                for model, delay in ((m, self.delay(m)) for m in list(self._samples))
+                if delay is not None
+            }
+        }
@@ -3,20 +3,104 @@ ParaSearch Backend - Parametric Knowledge Search Engine
 Uses only LLM's training knowledge, no web search or RAG
 """
 import asyncio
-import re
 import time
 import os
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, NamedTuple, Optional, Sequence, Tuple, TypeVar
 from datetime import datetime
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from pydantic import BaseModel, Field, ValidationError
 import httpx
 from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 import json
+import re
+import secrets
+from array import array
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-app = FastAPI(title="ParaSearch API", version="1.0.0")
+from config import (
+    OLLAMA_URLS, DEFAULT_MODEL, BACKEND_HOST, BACKEND_PORT, BACKEND_WORKERS, STATE_BACKEND, STATE_DB_PATH,
+    RATE_LIMIT_WINDOW, MAX_REQUESTS_PER_WINDOW, RATE_LIMIT_MAX_CLIENTS,
+    DEFAULT_NUM_RESULTS, DEFAULT_TEMPERATURE, CONFIDENCE_PENALTY_HIGH_RISK, TEMPERATURE_HIGH_RISK,
+    OLLAMA_MAX_CONNECTIONS, OLLAMA_MAX_KEEPALIVE, OLLAMA_KEEPALIVE_EXPIRY,
+    OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_HEALTH_TIMEOUT,
+    OLLAMA_KEEP_ALIVE, HEALTH_CHECK_INTERVAL, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT,
+    MODEL_CONCURRENCY, MODEL_CONCURRENCY_OVERRIDES, QUEUE_MAX_SIZE, QUEUE_MAX_WAIT,
+    BATCH_MAX_QUERIES, BATCH_DEFAULT_PARALLELISM, BATCH_MAX_PARALLELISM, BATCH_MAX_RETRIES, BATCH_MAX_RETRY_DELAY,
+    BATCH_MAX_QUERIES_PER_WINDOW,
+    CACHE_ENABLED, CACHE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_DB_PATH,
+    STRUCTURED_OUTPUT, STRUCTURED_OUTPUT_MAX_FAILURES, STRUCTURED_OUTPUT_RETRY, TOKENS_PER_RESULT, TOKEN_BUDGET_OVERHEAD,
+    WARMUP_ENABLED, PRELOAD_MODELS, WARMUP_TIMEOUT, WARMUP_RETRY_INTERVAL, PRELOAD_KEEP_ALIVE, REQUEST_TIMEOUT, REQUEST_TIMEOUT_MAX,
+    HEDGE_ENABLED, HEDGE_PERCENTILE, HEDGE_MAX_FRACTION, HEDGE_MIN_SAMPLES, HEDGE_WINDOW,
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_INDEX, SEMANTIC_CACHE_IVF_MIN_ENTRIES, SEMANTIC_CACHE_IVF_PROBES, SEMANTIC_CACHE_DB_PATH,
+    EMBED_TIMEOUT, CASCADE_MODELS, CASCADE_MIN_CONFIDENCE, CASCADE_ESCALATE_RISK,
+    LIGHT_TOKENS_PER_RESULT, EXPAND_MAX_TOKENS, EXPAND_MAX_REQUESTS_PER_WINDOW, CONTEXT_TTL, CONTEXT_MAX_ENTRIES, CURSOR_TTL, CURSOR_MAX_ENTRIES,
+    SUGGEST_ENABLED, SUGGEST_MAX_ENTRIES, SUGGEST_MAX_RESULTS, SUGGEST_MIN_COUNT, SUGGEST_DB_PATH,
+    print_config
+)
+from ollama_pool import OllamaPool, OllamaBackend, BackendUnavailable
+from shared_state import SQLiteSharedState, run_sqlite, write_failures
+from result_parser import ResultStreamParser, ParseStats, ParsedBlock
+from signals import scan_text, scan_query, risk_from_signals
+from scheduler import AdmissionController, AdmissionRejected
+from hedging import HedgePolicy
+from cascade import CascadePolicy
+from ratelimit import TokenBucketLimiter, SharedTokenBucketLimiter
+from cache import (
+    ResultCache, SQLiteCacheStore, SingleFlight, ExpiringStore, ContextStore,
+    make_cache_key, make_expansion_key, normalize_query
+)
+from semantic_cache import SemanticCache, SQLiteSemanticStore
+from suggest import SuggestionIndex, SQLiteQueryLog
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+def create_ollama_client(base_url: str) -> httpx.AsyncClient:
+    """Create the pooled keep-alive client used for every call to one Ollama backend"""
+    return httpx.AsyncClient(
+        base_url=base_url,
+        limits=httpx.Limits(
+            max_connections=OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=OLLAMA_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            OLLAMA_READ_TIMEOUT,
+            connect=OLLAMA_CONNECT_TIMEOUT
+        )
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ollama_pool.start()
+    if result_cache and result_cache.store:
+        result_cache.store.purge_expired()
+    # Warm up in the background so /health can answer "not ready" meanwhile
+    warmup_task = asyncio.create_task(warm_up()) if WARMUP_ENABLED else None
+    try:
+        yield
+    finally:
+        if warmup_task:
+            warmup_task.cancel()
+        await ollama_pool.stop()
+        # On the SQLite thread, so writes still queued there finish first
+        if result_cache:
+            await run_sqlite(result_cache.close)
+        if semantic_cache:
+            await run_sqlite(semantic_cache.close)
+        if suggestion_index:
+            await run_sqlite(suggestion_index.close)
+        if shared_state:
+            await run_sqlite(shared_state.close)
+
+app = FastAPI(title="ParaSearch API", version="1.0.0", lifespan=lifespan)
 
 # CORS for frontend
 app.add_middleware(
@@ -27,24 +111,89 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple rate limiting
-request_counts = defaultdict(list)
-
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from config import (
-    OLLAMA_URL, DEFAULT_MODEL, BACKEND_PORT, RATE_LIMIT_WINDOW, MAX_REQUESTS_PER_WINDOW,
-    DEFAULT_NUM_RESULTS, DEFAULT_TEMPERATURE, CONFIDENCE_PENALTY_HIGH_RISK, TEMPERATURE_HIGH_RISK,
-    print_config
+# State shared across uvicorn workers (None = per-process memory only)
+shared_state: Optional[SQLiteSharedState] = (
+    SQLiteSharedState(STATE_DB_PATH) if STATE_BACKEND == "sqlite" else None
 )
 
+# Per-client rate limiting
+if shared_state:
+    rate_limiter = SharedTokenBucketLimiter(
+        shared_state, MAX_REQUESTS_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS
+    )
+else:
+    rate_limiter = TokenBucketLimiter(MAX_REQUESTS_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS)
+
+# Separate per-client quota for the queries inside /search/batch calls
+if shared_state:
+    batch_limiter = SharedTokenBucketLimiter(
+        shared_state, BATCH_MAX_QUERIES_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS
+    )
+else:
+    batch_limiter = TokenBucketLimiter(BATCH_MAX_QUERIES_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS)
+
+# Separate per-client quota for generated /expand requests
+if shared_state:
+    expand_limiter = SharedTokenBucketLimiter(
+        shared_state, EXPAND_MAX_REQUESTS_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS
+    )
+else:
+    expand_limiter = TokenBucketLimiter(EXPAND_MAX_REQUESTS_PER_WINDOW, RATE_LIMIT_WINDOW, RATE_LIMIT_MAX_CLIENTS)
+
+# Cache of generated results for repeated queries. With shared state the
+# on-disk tier lives in the shared database so every worker sees it.
+cache_db_path = CACHE_DB_PATH or (STATE_DB_PATH if shared_state else "")
+result_cache: Optional[ResultCache] = ResultCache(
+    ttl=CACHE_TTL,
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    store=SQLiteCacheStore(cache_db_path) if cache_db_path else None
+) if CACHE_ENABLED else None
+
+# Near-duplicate queries, matched by embedding similarity
+semantic_db_path = SEMANTIC_CACHE_DB_PATH or cache_db_path
+semantic_cache: Optional[SemanticCache] = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=CACHE_TTL,
+    index=SEMANTIC_CACHE_INDEX,
+    ivf_min_entries=SEMANTIC_CACHE_IVF_MIN_ENTRIES,
+    ivf_probes=SEMANTIC_CACHE_IVF_PROBES,
+    store=SQLiteSemanticStore(semantic_db_path) if semantic_db_path else None
+) if SEMANTIC_CACHE_ENABLED else None
+
+# Autocomplete from previously served queries
+suggest_db_path = SUGGEST_DB_PATH or cache_db_path
+suggestion_index: Optional[SuggestionIndex] = SuggestionIndex(
+    max_entries=SUGGEST_MAX_ENTRIES,
+    top_k=SUGGEST_MAX_RESULTS,
+    min_count=SUGGEST_MIN_COUNT,
+    store=SQLiteQueryLog(suggest_db_path) if suggest_db_path else None
+) if SUGGEST_ENABLED else None
+
+# Ollama contexts of recent searches, continued by /expand and /search/more
+search_contexts = ContextStore(ttl=CONTEXT_TTL, max_entries=CONTEXT_MAX_ENTRIES)
+
+# "More results" cursors handed out with search responses (SearchCursor by id).
+# With shared state every field but the Ollama context is also stored there,
+# so another worker can continue the search by re-prompting.
+search_cursors = ExpiringStore(ttl=CURSOR_TTL, max_entries=CURSOR_MAX_ENTRIES)
+
+# Identical concurrent searches share one generation
+search_flights = SingleFlight()
+
+# Parse success/failure totals across all generations
+parse_stats = ParseStats()
+
+KNOWLEDGE_CUTOFF = "January 2025 (approximate - varies by model)"
+
 class SearchQuery(BaseModel):
     query: str
     model: Optional[str] = DEFAULT_MODEL
-    num_results: Optional[int] = DEFAULT_NUM_RESULTS
-    temperature: Optional[float] = DEFAULT_TEMPERATURE
+    num_results: int = Field(DEFAULT_NUM_RESULTS, ge=1, le=10)
+    temperature: float = Field(DEFAULT_TEMPERATURE, ge=0, le=2)
+    cascade: Optional[bool] = False  # answer with CASCADE_MODELS instead of model
+    lightweight: Optional[bool] = False  # leave out expanded_content; fetch it from /expand
 
 class SearchResult(BaseModel):
     title: str
@@ -54,6 +203,16 @@ class SearchResult(BaseModel):
     expanded_content: Optional[str] = None
     hallucination_risk: str  # "low", "medium", "high"
 
+class GeneratedSummary(BaseModel):
+    """The fields a lightweight search asks the model for"""
+    title: str
+    snippet: str
+    relevance_score: int = Field(ge=1, le=10)
+
+class GeneratedResult(GeneratedSummary):
+    """The SearchResult fields the model writes itself; its schema constrains structured output"""
+    expanded_content: str
+
 class SearchResponse(BaseModel):
     query: str
     results: List[SearchResult]
@@ -61,32 +220,221 @@ class SearchResponse(BaseModel):
     model_used: str
     knowledge_cutoff: str
     warning: Optional[str] = None
+    cached: bool = False
+    cascade_tier: Optional[int] = None  # index into CASCADE_MODELS of the model that answered
+    cursor: Optional[str] = None  # pass to /search/more for the next page
 
-def rate_limit_check(client_ip: str) -> bool:
-    """Simple rate limiting"""
-    now = time.time()
-    # Clean old requests
-    request_counts[client_ip] = [
-        req_time for req_time in request_counts[client_ip]
-        if now - req_time < RATE_LIMIT_WINDOW
-    ]
-    
-    if len(request_counts[client_ip]) >= MAX_REQUESTS_PER_WINDOW:
-        return False
-    
-    request_counts[client_ip].append(now)
-    return True
+class MoreResultsRequest(BaseModel):
+    cursor: str
+    num_results: Optional[int] = Field(default=None, ge=1, le=10)  # defaults to the first page's size
 
-async def check_ollama_health() -> Dict:
-    """Check if Ollama is running and get available models"""
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(f"{OLLAMA_URL}/api/tags")
+class SearchCursor(NamedTuple):
+    """Where a search left off: its settings, every title served so far and the last Ollama context"""
+    query: str
+    model: str
+    num_results: int
+    temperature: float
+    lightweight: bool
+    titles: Tuple[str, ...]
+    context: Optional[array]
+    structured: bool = False  # the context ends in JSON output rather than the text layout
+
+class ExpandRequest(BaseModel):
+    query: str
+    title: str
+    snippet: Optional[str] = ""
+    model: Optional[str] = DEFAULT_MODEL
+    # Settings of the lightweight search the result came from, to find its context
+    num_results: int = Field(DEFAULT_NUM_RESULTS, ge=1, le=10)
+    temperature: float = Field(DEFAULT_TEMPERATURE, ge=0, le=2)
+
+class ExpandResponse(BaseModel):
+    query: str
+    title: str
+    expanded_content: str
+    hallucination_risk: str
+    processing_time: float
+    model_used: str
+    cached: bool = False
+    context_reused: bool = False
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery]
+    parallelism: Optional[int] = BATCH_DEFAULT_PARALLELISM
+
+# Prometheus metrics, served at /metrics
+metrics = MetricsRegistry()
+STAGE_SECONDS = metrics.histogram(
+    "parasearch_stage_duration_seconds",
+    "Time spent in each search stage (rate_limit, embed, prompt, queue, generation, expand, parse)",
+    ["stage", "model", "status"]
+)
+REQUEST_SECONDS = metrics.histogram(
+    "parasearch_request_duration_seconds",
+    "Search request time from arrival to the last byte of the response",
+    ["endpoint", "model", "status"]
+)
+HEALTH_PROBE_SECONDS = metrics.histogram(
+    "parasearch_health_probe_duration_seconds",
+    "Ollama health probe time",
+    ["backend", "status"]
+)
+OLLAMA_GENERATIONS = metrics.counter(
+    "parasearch_ollama_generations_total", "Completed Ollama generations", ["model"]
+)
+OLLAMA_EVAL_TOKENS = metrics.counter(
+    "parasearch_ollama_eval_tokens_total", "Tokens generated (Ollama eval_count)", ["model"]
+)
+OLLAMA_EVAL_SECONDS = metrics.counter(
+    "parasearch_ollama_eval_seconds_total", "Time spent generating tokens (Ollama eval_duration)", ["model"]
+)
+OLLAMA_PROMPT_TOKENS = metrics.counter(
+    "parasearch_ollama_prompt_eval_tokens_total", "Prompt tokens evaluated (Ollama prompt_eval_count)", ["model"]
+)
+OLLAMA_PROMPT_SECONDS = metrics.counter(
+    "parasearch_ollama_prompt_eval_seconds_total", "Time spent evaluating prompts (Ollama prompt_eval_duration)", ["model"]
+)
+OLLAMA_LOAD_SECONDS = metrics.counter(
+    "parasearch_ollama_load_seconds_total", "Time spent loading models (Ollama load_duration)", ["model"]
+)
+OLLAMA_COLD_LOADS = metrics.counter(
+    "parasearch_ollama_cold_loads_total", "Generations that had to load the model first", ["model"]
+)
+OLLAMA_STOPS = metrics.counter(
+    "parasearch_ollama_generation_stops_total",
+    "How generations ended: stop (model finished), length (hit the token budget), "
+    "early (cancelled once enough results were parsed)",
+    ["model", "reason"]
+)
+BACKEND_HEALTHY = metrics.gauge(
+    "parasearch_ollama_backend_healthy", "Whether an Ollama backend is in rotation", ["backend"]
+)
+BACKEND_IN_FLIGHT = metrics.gauge(
+    "parasearch_ollama_backend_in_flight", "Generations outstanding on an Ollama backend", ["backend"]
+)
+ADMISSION_ACTIVE = metrics.gauge(
+    "parasearch_admission_active", "Generation slots in use per model", ["model"]
+)
+ADMISSION_QUEUED = metrics.gauge(
+    "parasearch_admission_queued", "Requests waiting for a generation slot per model", ["model"]
+)
+CACHE_ENTRIES = metrics.gauge("parasearch_cache_entries", "Search results held in the in-memory cache")
+SQLITE_WRITE_FAILURES = metrics.gauge(
+    "parasearch_sqlite_write_failures", "Queued SQLite writes that failed since startup, by operation", ["operation"]
+)
+SEMANTIC_LOOKUPS = metrics.counter(
+    "parasearch_semantic_cache_lookups_total",
+    "Semantic cache lookups after an exact-cache miss (hit, miss, or unavailable when embedding failed)",
+    ["outcome"]
+)
+CASCADE_ANSWERS = metrics.counter(
+    "parasearch_cascade_answers_total", "Cascade searches by the model that answered", ["model"]
+)
+CASCADE_ESCALATIONS = metrics.counter(
+    "parasearch_cascade_escalations_total",
+    "Cascade searches passed on from a model, by reason (low_confidence, hallucination_risk, "
+    "no_results, query_risk, unavailable)",
+    ["model", "reason"]
+)
+HEDGES = metrics.counter(
+    "parasearch_hedged_generations_total",
+    "Generations that started a backup on a second backend, by outcome "
+    "(primary won, backup won, backup_failed to start or run)",
+    ["model", "outcome"]
+)
+PARSE_OUTPUTS = metrics.counter(
+    "parasearch_parse_outputs_total",
+    "Model outputs parsed, by output mode and outcome (complete, partial, empty)",
+    ["model", "mode", "outcome"]
+)
+
+# A load_duration above this means Ollama loaded the model for the request
+COLD_LOAD_SECONDS = 0.5
+
+def model_label(model: Optional[str]) -> str:
+    """Model name for metric labels; unknown names collapse so clients can't add series"""
+    if model and any(b.has_model(model) for b in ollama_pool.backends):
+        return model
+    return "other"
+
+async def rate_limit_check(client_ip: str, model: Optional[str] = None, limiter=None) -> bool:
+    """Token bucket rate limiting, O(1) per request; rate_limiter unless another limiter is given"""
+    limiter = limiter or rate_limiter
+    with STAGE_SECONDS.time(stage="rate_limit", model=model_label(model)) as labels:
+        if shared_state:
+            # A SQLite transaction may wait on another worker; keep it off the event loop
+            allowed = await run_sqlite(limiter.allow, client_ip)
+        else:
+            allowed = limiter.allow(client_ip)
+        labels["status"] = "allowed" if allowed else "rejected"
+    return allowed
+
+async def take_batch_token(client_ip: str):
+    """Wait until the client's batch quota allows one more query"""
+    key = f"batch:{client_ip}"
+    while not (await run_sqlite(batch_limiter.allow, key) if shared_state else batch_limiter.allow(key)):
+        await asyncio.sleep(RATE_LIMIT_WINDOW / max(1, BATCH_MAX_QUERIES_PER_WINDOW))
+
+async def check_ollama_health(client: httpx.AsyncClient) -> Dict:
+    """Check if an Ollama backend is running and get available models"""
+    with HEALTH_PROBE_SECONDS.time(backend=str(client.base_url)) as labels:
+        try:
+            response = await client.get("/api/tags", timeout=OLLAMA_HEALTH_TIMEOUT)
             if response.status_code == 200:
+                labels["status"] = "healthy"
                 return {"status": "healthy", "models": response.json()}
+            labels["status"] = "unhealthy"
             return {"status": "unhealthy", "error": "Bad response"}
-    except Exception as e:
-        return {"status": "unhealthy", "error": str(e)}
+        except Exception as e:
+            labels["status"] = "unhealthy"
+            return {"status": "unhealthy", "error": str(e)}
+
+# Ollama backends, each with its own pooled client, background health
+# monitor and circuit breaker. Generations go to the least loaded one.
+ollama_pool = OllamaPool([
+    OllamaBackend(
+        url,
+        client_factory=create_ollama_client,
+        probe=check_ollama_health,
+        health_interval=HEALTH_CHECK_INTERVAL,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT
+    )
+    for url in OLLAMA_URLS
+])
+
+# Per-model generation slots with a bounded wait queue
+admission = AdmissionController(
+    default_limit=MODEL_CONCURRENCY,
+    max_queue=QUEUE_MAX_SIZE,
+    max_wait=QUEUE_MAX_WAIT,
+    limits=MODEL_CONCURRENCY_OVERRIDES,
+    backends=lambda model: len(ollama_pool.candidates(model))
+)
+
+# Set inside batch searches: their generations queue behind interactive ones
+background_generation: ContextVar[bool] = ContextVar("background_generation", default=False)
+
+# Backup generations for slow primaries; only useful with several backends
+hedge_policy: Optional[HedgePolicy] = HedgePolicy(
+    percentile=HEDGE_PERCENTILE,
+    max_fraction=HEDGE_MAX_FRACTION,
+    min_samples=HEDGE_MIN_SAMPLES,
+    window=HEDGE_WINDOW
+) if HEDGE_ENABLED and len(OLLAMA_URLS) > 1 else None
+
+# Small-to-large model tiers for searches that ask for the cascade
+cascade_policy: Optional[CascadePolicy] = CascadePolicy(
+    CASCADE_MODELS,
+    min_confidence=CASCADE_MIN_CONFIDENCE,
+    escalate_risk=CASCADE_ESCALATE_RISK
+) if len(CASCADE_MODELS) >= 2 else None
+
+def backend_unavailable_error(e: Exception) -> HTTPException:
+    """Turn a pool or admission rejection into a fail-fast HTTP error"""
+    if getattr(e, "model_missing", False):
+        return HTTPException(status_code=404, detail=str(e))
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
 
 # Enhanced Guardrails System
 SYSTEM_CONSTITUTION = """
@@ -282,20 +630,32 @@ EXPANDED: I have limited ability to answer this query accurately. My knowledge i
 ═══════════════════════════════════════════════════════════════
 """
 
-def construct_primed_prompt(user_query: str, num_results: int) -> str:
+# The constitution and few-shot examples never change between requests.
+# Sending them as an identical system prefix lets Ollama reuse the
+# evaluated prefix from its prompt cache instead of re-evaluating it.
+STATIC_SYSTEM_PROMPT = f"""{SYSTEM_CONSTITUTION}
+
+{FEW_SHOT_EXAMPLES}"""
+
+def construct_query_prompt(user_query: str, num_results: int, structured: bool = False,
+                           lightweight: bool = False, exclude_titles: Sequence[str] = ()) -> str:
     """
-    Constructs a fully primed prompt with system instructions, constitution,
-    few-shot examples, and the user query.
-    
-    This is where the magic happens - we're setting up the LLM's "operating system"
-    before it processes the search query.
+    Constructs the per-query part of the prompt. It is sent after the
+    static system prefix (STATIC_SYSTEM_PROMPT). With structured=True the
+    results are requested as JSON matching structured_output_schema().
+    With lightweight=True the expanded text is left out. exclude_titles
+    lists results the user already has, which must not come back.
     """
     
-    prompt = f"""{SYSTEM_CONSTITUTION}
-
-{FEW_SHOT_EXAMPLES}
-
-═══════════════════════════════════════════════════════════════
+    if structured:
+        output_format = structured_output_format(num_results, lightweight)
+    else:
+        output_format = text_output_format(num_results, lightweight)
+    if exclude_titles:
+        shown = "\n".join(f"- {title}" for title in exclude_titles)
+        output_format += f"\n\nThese results were already shown. Do not repeat them or their topics:\n{shown}"
+    
+    prompt = f"""═══════════════════════════════════════════════════════════════
 NOW PROCESS THIS SEARCH QUERY
 ═══════════════════════════════════════════════════════════════
 
@@ -303,7 +663,26 @@ Remember your constitution. Follow the quality standards. Be honest about uncert
 
 User Query: "{user_query}"
 
-Generate exactly {num_results} search results following the format below.
+{output_format}
+
+CRITICAL REMINDERS:
+- Use the relevance rubric to score honestly
+- Include uncertainty language when appropriate
+- Reduce scores for recent events or specialized topics
+- If you truly don't know, say so and lower the relevance score
+- Follow the structured format EXACTLY
+- No conversational language
+
+BEGIN OUTPUT:
+"""
+    
+    return prompt
+
+def text_output_format(num_results: int, lightweight: bool = False) -> str:
+    expanded = "" if lightweight else "EXPANDED: [4-6 sentences with deeper detail. Include caveats if uncertain.]\n"
+    # The few-shot examples all show EXPANDED, so say explicitly to leave it out
+    omit = "\n\nDo not write EXPANDED lines; expanded detail is requested separately." if lightweight else ""
+    return f"""Generate exactly {num_results} search results following the format below.
 
 OUTPUT FORMAT (STRICT):
 
@@ -311,46 +690,107 @@ RESULT 1
 TITLE: [Clear, specific, informative title]
 SNIPPET: [2-3 sentences of core information. Be specific and factual.]
 RELEVANCE: [Score 1-10 based on the rubric above. Be honest about uncertainty.]
-EXPANDED: [4-6 sentences with deeper detail. Include caveats if uncertain.]
----
+{expanded}---
 
 RESULT 2
 [Same format]
 ---
 
-[Continue for {num_results} results]
+[Continue for {num_results} results]{omit}"""
 
-CRITICAL REMINDERS:
-- Use the relevance rubric to score honestly
-- Include uncertainty language when appropriate
-- Reduce scores for recent events or specialized topics
-- If you truly don't know, say so and lower the relevance score
-- Follow the structured format EXACTLY
-- No conversational language
+def construct_more_prompt(num_results: int, first_index: int, lightweight: bool = False,
+                          structured: bool = False) -> str:
+    """
+    Prompt for the next page of results. It continues the Ollama context
+    of the previous page, so the query and earlier results are already
+    in front of the model.
+    """
+    if structured:
+        omit = ' Leave out "expanded_content".' if lightweight else ""
+        return f"""Continue with {num_results} more search results for the same query, as a new JSON object in exactly the same format.{omit} Do not repeat any earlier result or its topic.
 
 BEGIN OUTPUT:
 """
-    
-    return prompt
+    omit = " Do not write EXPANDED lines." if lightweight else ""
+    return f"""Continue with {num_results} more search results for the same query, numbered from RESULT {first_index}, in exactly the same format.{omit} Do not repeat any earlier result or its topic.
+
+BEGIN OUTPUT:
+"""
+
+def structured_output_format(num_results: int, lightweight: bool = False) -> str:
+    expanded = "" if lightweight else (
+        ',\n    "expanded_content": "[4-6 sentences with deeper detail. Include caveats if uncertain.]"'
+    )
+    return f"""Generate exactly {num_results} search results as a JSON object in this format:
+
+{{"results": [
+  {{
+    "title": "[Clear, specific, informative title]",
+    "snippet": "[2-3 sentences of core information. Be specific and factual.]",
+    "relevance_score": [Score 1-10 based on the rubric above. Be honest about uncertainty.]{expanded}
+  }}
+]}}
+
+The "results" list must contain exactly {num_results} objects."""
+
+# JSON schemas for one generated result, derived from GeneratedResult and GeneratedSummary
+GENERATED_RESULT_SCHEMA = GeneratedResult.model_json_schema()
+GENERATED_SUMMARY_SCHEMA = GeneratedSummary.model_json_schema()
+
+def structured_output_schema(num_results: int, lightweight: bool = False) -> Dict:
+    """The JSON schema passed as Ollama's format parameter in structured mode"""
+    return {
+        "type": "object",
+        "properties": {
+            "results": {
+                "type": "array",
+                "items": GENERATED_SUMMARY_SCHEMA if lightweight else GENERATED_RESULT_SCHEMA,
+                "minItems": num_results,
+                "maxItems": num_results
+            }
+        },
+        "required": ["results"]
+    }
+
+# Structured output falls back to the text layout where it doesn't work:
+# per backend and model when that Ollama rejects the format schema, and
+# per model when its JSON failed to decode several times in a row. Both
+# are tried again after STRUCTURED_OUTPUT_RETRY seconds.
+structured_failures: Dict[str, int] = defaultdict(int)
+structured_disabled: Dict[str, float] = {}             # model -> when to retry
+structured_rejected: Dict[Tuple[str, str], float] = {}  # (backend url, model) -> when to retry
+
+def _switched_off(table: Dict, key) -> bool:
+    retry_at = table.get(key)
+    if retry_at is None:
+        return False
+    if retry_at <= time.monotonic():
+        del table[key]
+        return False
+    return True
+
+def use_structured_output(model: str) -> bool:
+    return STRUCTURED_OUTPUT and not _switched_off(structured_disabled, model)
+
+def structured_unsupported(model: str) -> Tuple[OllamaBackend, ...]:
+    """Backends whose Ollama recently rejected the format schema for model"""
+    return tuple(b for b in ollama_pool.backends if _switched_off(structured_rejected, (b.url, model)))
+
+def record_structured_outcome(model: str, decoded: bool):
+    if decoded:
+        structured_failures[model] = 0
+        return
+    structured_failures[model] += 1
+    if structured_failures[model] >= STRUCTURED_OUTPUT_MAX_FAILURES:
+        structured_failures[model] = 0
+        structured_disabled[model] = time.monotonic() + STRUCTURED_OUTPUT_RETRY
 
 def analyze_query_risk(query: str) -> dict:
     """
     Analyzes the query BEFORE sending to LLM to determine risk level
     and adjust guardrails accordingly.
     """
-    query_lower = query.lower()
-    
-    risk_signals = {
-        'recent_events': ['today', 'now', 'current', 'latest', 'recent', '2025', '2026', 'this year'],
-        'real_time_data': ['weather', 'stock', 'price', 'news', 'score', 'election results'],
-        'specialized': ['theorem', 'equation', 'proof', 'diagnosis', 'legal', 'medical advice'],
-        'personal': ['my', 'i', 'me', 'personal', 'private']
-    }
-    
-    detected_risks = []
-    for risk_type, keywords in risk_signals.items():
-        if any(keyword in query_lower for keyword in keywords):
-            detected_risks.append(risk_type)
+    detected_risks = scan_query(query)
     
     return {
         'risk_level': 'high' if len(detected_risks) >= 2 else ('medium' if detected_risks else 'low'),
@@ -362,121 +802,644 @@ def analyze_query_risk(query: str) -> dict:
 
 def detect_hallucination_risk(text: str) -> str:
     """Analyze text for hallucination indicators"""
-    hedge_words = [
-        "i think", "probably", "might", "could be", "possibly", 
-        "i'm not sure", "uncertain", "may", "perhaps", "likely"
-    ]
-    
-    conflicting_phrases = [
-        "on the other hand", "however it's also", "but there's debate",
-        "sources differ", "unclear", "disputed"
-    ]
-    
-    text_lower = text.lower()
-    
-    # Count hedge words and conflicting statements
-    hedge_count = sum(1 for word in hedge_words if word in text_lower)
-    conflict_count = sum(1 for phrase in conflicting_phrases if phrase in text_lower)
-    
-    # Check for dates/numbers that might be fabricated
-    has_specific_numbers = bool(re.search(r'\b\d{4}\b|\b\d+%\b|\$\d+', text))
-    
-    total_indicators = hedge_count + conflict_count
-    
-    if total_indicators >= 3 or conflict_count >= 2:
-        return "high"
-    elif total_indicators >= 1 or (has_specific_numbers and hedge_count >= 1):
-        return "medium"
-    else:
-        return "low"
+    return risk_from_signals(scan_text(text))
 
-def calculate_confidence(result_text: str, relevance: int) -> float:
+def calculate_confidence(result_text: str, relevance: int, risk: Optional[str] = None) -> float:
     """Calculate confidence score based on language and relevance"""
     # Start with relevance-based confidence
     base_confidence = relevance / 10.0
     
-    # Adjust based on hallucination risk
-    risk = detect_hallucination_risk(result_text)
+    # Adjust based on hallucination risk (pass it in if already computed)
+    if risk is None:
+        risk = detect_hallucination_risk(result_text)
     risk_penalties = {"low": 0.0, "medium": 0.15, "high": 0.3}
     
     confidence = max(0.0, min(1.0, base_confidence - risk_penalties[risk]))
     return round(confidence, 2)
 
-async def generate_search_results(query: str, model: str, num_results: int, temperature: float) -> List[SearchResult]:
-    """Generate search results using Ollama with enhanced prompt priming"""
+def token_budget(num_results: int, lightweight: bool = False) -> Optional[int]:
+    """num_predict for a request, or None to leave generation unbounded"""
+    per_result = LIGHT_TOKENS_PER_RESULT if lightweight else TOKENS_PER_RESULT
+    if per_result <= 0:
+        return None
+    return num_results * per_result + TOKEN_BUDGET_OVERHEAD
+
+def build_generate_payload(query: str, model: str, num_results: int, temperature: float, stream: bool,
+                           structured: bool = False, lightweight: bool = False,
+                           exclude_titles: Sequence[str] = ()) -> Dict:
+    """Build an /api/generate request with the static prefix as the system prompt"""
+    with STAGE_SECONDS.time(stage="prompt", model=model_label(model)):
+        prompt = construct_query_prompt(query, num_results, structured, lightweight, exclude_titles)
+    payload = {
+        "model": model,
+        "system": STATIC_SYSTEM_PROMPT,
+        "prompt": prompt,
+        "options": {"temperature": temperature},
+        "keep_alive": keep_alive_for(model),
+        "stream": stream
+    }
+    budget = token_budget(num_results, lightweight)
+    if budget:
+        payload["options"]["num_predict"] = budget
+    if structured:
+        payload["format"] = structured_output_schema(num_results, lightweight)
+    return payload
+
+# Chunks a search reads past its last result, hoping for the final chunk and its context
+CONTEXT_GRACE_CHUNKS = 8
+
+def remember_context(query: str, model: str, num_results: int, temperature: float, result: Dict,
+                     lightweight: bool = False, structured: bool = False):
+    """
+    Keep the Ollama context of a finished search so /expand and
+    /search/more can continue it. Contexts that end in JSON output are
+    kept apart, since a continuation has to ask for JSON again.
+    """
+    context = result.get("context")
+    if context:
+        key = make_cache_key(query, model, num_results, temperature, lightweight)
+        search_contexts.set(key + "|json" if structured else key, context)
+
+def find_context(query: str, model: str, num_results: int, temperature: float,
+                 lightweight: bool = False) -> Tuple[Optional[List[int]], bool]:
+    """A search's kept Ollama context, if any, and whether it ends in JSON output"""
+    key = make_cache_key(query, model, num_results, temperature, lightweight)
+    context = search_contexts.get(key)
+    if context is not None:
+        return context, False
+    context = search_contexts.get(key + "|json")
+    return context, context is not None
+
+# Prompt evaluation stats per model, to verify the static prefix is reused
+generation_stats = defaultdict(lambda: {
+    "generations": 0,
+    "prompt_eval_count": 0,
+    "prompt_eval_duration_ms": 0.0,
+    "last_prompt_eval_count": None,
+    "last_prompt_eval_duration_ms": None
+})
+
+def record_generation_stats(model: str, result: Dict):
+    """Record prompt_eval_count/prompt_eval_duration from a finished Ollama response"""
+    stats = generation_stats[model]
+    prompt_eval_count = result.get("prompt_eval_count", 0)
+    prompt_eval_ms = result.get("prompt_eval_duration", 0) / 1e6  # Ollama reports nanoseconds
+    stats["generations"] += 1
+    stats["prompt_eval_count"] += prompt_eval_count
+    stats["prompt_eval_duration_ms"] += prompt_eval_ms
+    stats["last_prompt_eval_count"] = prompt_eval_count
+    stats["last_prompt_eval_duration_ms"] = round(prompt_eval_ms, 1)
     
-    # Use the sophisticated primed prompt instead of the simple one
-    prompt = construct_primed_prompt(query, num_results)
+    label = model_label(model)
+    load_seconds = result.get("load_duration", 0) / 1e9
+    OLLAMA_GENERATIONS.inc(model=label)
+    OLLAMA_EVAL_TOKENS.inc(result.get("eval_count", 0), model=label)
+    OLLAMA_EVAL_SECONDS.inc(result.get("eval_duration", 0) / 1e9, model=label)
+    OLLAMA_PROMPT_TOKENS.inc(prompt_eval_count, model=label)
+    OLLAMA_PROMPT_SECONDS.inc(prompt_eval_ms / 1e3, model=label)
+    OLLAMA_LOAD_SECONDS.inc(load_seconds, model=label)
+    if load_seconds > COLD_LOAD_SECONDS:
+        OLLAMA_COLD_LOADS.inc(model=label)
+    OLLAMA_STOPS.inc(model=label, reason=result.get("done_reason") or "stop")
+
+def get_generation_stats() -> Dict:
+    return {
+        model: {
+            **stats,
+            "prompt_eval_duration_ms": round(stats["prompt_eval_duration_ms"], 1),
+            "avg_prompt_eval_count": round(stats["prompt_eval_count"] / stats["generations"], 1),
+            "avg_prompt_eval_duration_ms": round(stats["prompt_eval_duration_ms"] / stats["generations"], 1)
+        }
+        for model, stats in generation_stats.items()
+        if stats["generations"]
+    }
 
+@asynccontextmanager
+async def generation_slot(model: str, overflow: bool = False,
+                          exclude: Tuple[OllamaBackend, ...] = ()) -> AsyncIterator[OllamaBackend]:
+    """
+    Wait for an admission slot (or, with overflow=True, take one at
+    once even past the limit), then lease a backend not in exclude for
+    the block. Times the "queue" stage until the slot is granted and the
+    "generation" stage while the backend is held. Inside a batch search
+    the slot comes from the background queue.
+    """
+    label = model_label(model)
+    queued_at = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "temperature": temperature,
-                    "stream": False
-                }
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=500, detail="Ollama request failed")
-            
-            result = response.json()
-            generated_text = result.get("response", "")
-            
-            # Parse results
-            return parse_search_results(generated_text, num_results)
-            
+        async with admission.slot(model, overflow=overflow, background=background_generation.get()):
+            STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="queue", model=label, status="ok")
+            with STAGE_SECONDS.time(stage="generation", model=label) as labels:
+                try:
+                    async with ollama_pool.lease(model, exclude) as backend:
+                        yield backend
+                except BackendUnavailable:
+                    labels["status"] = "unavailable"
+                    raise
+    except AdmissionRejected:
+        STAGE_SECONDS.observe(time.perf_counter() - queued_at, stage="queue", model=label, status="rejected")
+        raise
+
+class GenerationAttempt:
+    """
+    One streaming Ollama generation, run in its own task so it can be
+    raced against a hedge and cancelled on its own. Chunks are queued for
+    the reader; None marks the end of the stream and a failure is queued
+    as the exception itself.
+    """
+    
+    def __init__(self, model: str, payload: Dict, hedge: bool = False,
+                 exclude: Tuple[OllamaBackend, ...] = ()):
+        self.model = model
+        self.backend: Optional[OllamaBackend] = None
+        self.leased = asyncio.Event()       # set once a backend is held (or the attempt failed)
+        self.has_output = asyncio.Event()   # set once anything is queued
+        self.started = 0.0
+        self.first_output = 0.0
+        self.failed = False
+        self.stopping = False
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        # A hedge never waits in the admission queue: it is needed most when
+        # every slot is busy, and HedgePolicy already caps how many there are
+        self.task = asyncio.create_task(self._run(payload, overflow=hedge, exclude=exclude))
+    
+    def _put(self, item):
+        if not self.has_output.is_set():
+            self.first_output = time.perf_counter()
+            self.failed = isinstance(item, Exception)
+            self.has_output.set()
+        self.chunks.put_nowait(item)
+    
+    async def _run(self, payload: Dict, overflow: bool, exclude: Tuple[OllamaBackend, ...]):
+        try:
+            async with generation_slot(self.model, overflow, exclude) as backend:
+                self.backend = backend
+                self.started = time.perf_counter()
+                self.leased.set()
+                async with backend.client.stream("POST", "/api/generate", json=payload) as response:
+                    if response.status_code != 200:
+                        raise HTTPException(status_code=500, detail="Ollama request failed")
+                    try:
+                        async for line in response.aiter_lines():
+                            if line.strip():
+                                self._put(json.loads(line))
+                    except asyncio.CancelledError:
+                        # Stopped once the reader had enough: close the stream as a normal finish
+                        if not self.stopping:
+                            raise
+        except Exception as e:
+            self._put(e)
+        else:
+            self._put(None)
+        finally:
+            self.leased.set()
+    
+    @property
+    def first_chunk_time(self) -> float:
+        return self.first_output - self.started
+    
+    async def next_chunk(self) -> Optional[Dict]:
+        """The next chunk from Ollama, or None once the stream has ended"""
+        item = await self.chunks.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+    
+    async def cancel(self):
+        """Abandon the generation"""
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+    
+    async def stop(self):
+        """End the generation early because the reader has what it needs"""
+        self.stopping = True
+        await self.cancel()
+
+async def wait_for_output(attempts: List[GenerationAttempt], timeout: Optional[float] = None) -> bool:
+    """Wait until any attempt has queued output; False if the timeout passed first"""
+    waiters = [asyncio.ensure_future(a.has_output.wait()) for a in attempts]
+    try:
+        done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+    return bool(done)
+
+async def start_generation(model: str, payload: Dict) -> GenerationAttempt:
+    """
+    Start a streaming generation and wait for its first chunk.
+    
+    With hedging on, a primary that holds a backend but has no first
+    chunk within the hedge delay gets a backup on another backend. The
+    first attempt to produce a chunk wins and the other is cancelled. A
+    backup skips the admission queue (see AdmissionController.acquire);
+    if no other healthy backend can take it, it just fails, leaving the
+    primary to finish on its own.
+    """
+    primary = GenerationAttempt(model, payload)
+    attempts = [primary]
+    backup = None
+    try:
+        delay = hedge_policy.delay(model) if hedge_policy else None
+        if delay is not None:
+            await primary.leased.wait()
+            if (not await wait_for_output(attempts, delay) and primary.backend
+                    and ollama_pool.candidates(model, exclude=(primary.backend,)) and hedge_policy.allow()):
+                backup = GenerationAttempt(model, payload, hedge=True, exclude=(primary.backend,))
+                attempts.append(backup)
+        
+        while True:
+            await wait_for_output(attempts)
+            winner = next(a for a in attempts if a.has_output.is_set())
+            if winner.failed and len(attempts) > 1:
+                # Let the other attempt carry on
+                attempts.remove(winner)
+                continue
+            break
+    except BaseException:
+        for attempt in attempts:
+            await attempt.cancel()
+        if backup is not None:
+            # Release the hedge allow() reserved
+            hedge_policy.record(True)
+        raise
+    
+    for attempt in attempts:
+        if attempt is not winner:
+            await attempt.cancel()
+    
+    if hedge_policy:
+        hedge_policy.record(backup is not None, backup_won=winner is backup)
+        if backup is not None:
+            outcome = "backup" if winner is backup else ("backup_failed" if backup.failed else "primary")
+            HEDGES.inc(model=model_label(model), outcome=outcome)
+        if not winner.failed:
+            hedge_policy.observe(model, winner.first_chunk_time)
+    return winner
+
+# Models loaded and warmed up at startup, then kept resident
+WARMUP_MODELS = list(dict.fromkeys([DEFAULT_MODEL] + PRELOAD_MODELS + CASCADE_MODELS))
+
+# Warm-up outcome per backend URL and model
+warmup_state: Dict[str, Dict[str, Dict]] = {}
+
+def warmup_complete() -> bool:
+    """Ready once DEFAULT_MODEL is warm on at least one reachable backend"""
+    if not WARMUP_ENABLED:
+        return True
+    return any(
+        b.health.healthy and warmup_state.get(b.url, {}).get(DEFAULT_MODEL, {}).get("status") == "warm"
+        for b in ollama_pool.backends
+    )
+
+def full_model_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+def keep_alive_for(model: str) -> str:
+    """Warmed-up models stay pinned; others unload after OLLAMA_KEEP_ALIVE idle"""
+    if WARMUP_ENABLED and full_model_name(model) in {full_model_name(m) for m in WARMUP_MODELS}:
+        return PRELOAD_KEEP_ALIVE
+    return OLLAMA_KEEP_ALIVE
+
+async def warm_up_model(backend: OllamaBackend, model: str) -> Dict:
+    """
+    Load a model and evaluate the static system prompt with a one-token
+    generation, leaving both the weights and the prefix in Ollama's caches.
+    """
+    started = time.perf_counter()
+    try:
+        response = await backend.client.post(
+            "/api/generate",
+            json={
+                "model": model,
+                "system": STATIC_SYSTEM_PROMPT,
+                "prompt": construct_query_prompt("warm-up", 1),
+                "options": {"num_predict": 1},
+                "keep_alive": PRELOAD_KEEP_ALIVE,
+                "stream": False
+            },
+            # Loading a model can take far longer than a normal read timeout
+            timeout=httpx.Timeout(WARMUP_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)
+        )
+        if response.status_code != 200:
+            return {"status": "failed", "error": f"Ollama returned {response.status_code}"}
+        result = response.json()
+    except httpx.HTTPError as e:
+        return {"status": "failed", "error": str(e) or type(e).__name__}
+    return {
+        "status": "warm",
+        "load_duration": round(result.get("load_duration", 0) / 1e9, 2),
+        "prompt_eval_count": result.get("prompt_eval_count", 0),
+        "elapsed": round(time.perf_counter() - started, 2)
+    }
+
+async def warm_up():
+    """
+    Warm WARMUP_MODELS on every backend, then keep them warm. Models load
+    one at a time per backend, since Ollama loads them one at a time
+    anyway, and backends warm up in parallel.
+
+    Each backend is rechecked on the health interval: a failed warm-up
+    is retried after WARMUP_RETRY_INTERVAL, a model installed later is
+    picked up, and a backend that went down (and may have restarted,
+    dropping its loaded models) is warmed again once it is back.
+    """
+    async def warm_backend(backend: OllamaBackend):
+        state = warmup_state[backend.url] = {model: {"status": "pending"} for model in WARMUP_MODELS}
+        retry_at: Dict[str, float] = {}
+        while True:
+            for model in WARMUP_MODELS:
+                if not backend.health.healthy:
+                    state[model] = {"status": "failed", "error": "Ollama not reachable"}
+                elif state[model]["status"] == "warm" or time.monotonic() < retry_at.get(model, 0):
+                    continue
+                elif not backend.has_model(model):
+                    state[model] = {"status": "failed", "error": "Model not installed"}
+                else:
+                    state[model] = {"status": "loading"}
+                    state[model] = await warm_up_model(backend, model)
+                    if state[model]["status"] != "warm":
+                        retry_at[model] = time.monotonic() + WARMUP_RETRY_INTERVAL
+            await asyncio.sleep(backend.health.interval)
+    
+    await asyncio.gather(*(warm_backend(b) for b in ollama_pool.backends))
+
+async def generate_search_results(query: str, model: str, num_results: int, temperature: float,
+                                  lightweight: bool = False) -> List[SearchResult]:
+    """
+    Generate search results using Ollama with enhanced prompt priming.
+    
+    Text-layout generations are streamed internally so Ollama can be
+    stopped as soon as num_results complete blocks have been parsed.
+    """
+    try:
+        results = None
+        if use_structured_output(model):
+            results = await generate_structured_results(query, model, num_results, temperature, lightweight)
+        if results is None:
+            results = [
+                result async for result in
+                stream_search_results(query, model, num_results, temperature, lightweight)
+            ]
+    except HTTPException:
+        raise
+    except (BackendUnavailable, AdmissionRejected) as e:
+        raise backend_unavailable_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    
+    # Sort by relevance and confidence
+    results.sort(key=lambda x: (x.relevance_score, x.confidence), reverse=True)
+    return results
 
-def parse_search_results(text: str, expected_count: int) -> List[SearchResult]:
-    """Parse LLM output into structured results"""
-    results = []
+async def generate_structured_results(query: str, model: str, num_results: int, temperature: float,
+                                      lightweight: bool = False) -> Optional[List[SearchResult]]:
+    """
+    Generate results as JSON in one non-streaming request; the schema caps
+    the number of results. Returns None (use the text layout) when the
+    least loaded backend is known to reject the schema, so load still
+    spreads over every backend, or when the chosen Ollama rejects it.
+    """
+    result = await request_structured(model, build_generate_payload(
+        query, model, num_results, temperature, stream=False, structured=True, lightweight=lightweight
+    ))
+    if result is None:
+        return None
+    remember_context(query, model, num_results, temperature, result, lightweight, structured=True)
     
-    # Split by result delimiter
-    result_blocks = re.split(r'---+|\n\s*\n', text)
+    with STAGE_SECONDS.time(stage="parse", model=model_label(model)):
+        return parse_search_results(result.get("response", ""), num_results, model,
+                                    structured=True, lightweight=lightweight)
+
+async def request_structured(model: str, payload: Dict) -> Optional[Dict]:
+    """
+    Send a non-streaming generation whose payload carries a format
+    schema and return Ollama's reply, or None when the backend that would
+    serve it rejects the schema (see generate_structured_results).
+    """
+    exclude = structured_unsupported(model)
+    candidates = ollama_pool.candidates(model)
+    if exclude and (not candidates or candidates[0] in exclude):
+        return None
+    async with generation_slot(model, exclude=exclude) as backend:
+        response = await backend.client.post("/api/generate", json=payload)
+        if response.status_code == 400:
+            # This Ollama does not accept a schema as format: not a backend failure
+            structured_rejected[(backend.url, model)] = time.monotonic() + STRUCTURED_OUTPUT_RETRY
+            return None
+        # Raised inside the lease so the circuit breaker counts the failure
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail="Ollama request failed")
+        result = response.json()
+    record_generation_stats(model, result)
+    return result
+
+def semantic_scope(model: str, num_results: int, temperature: float, lightweight: bool = False) -> str:
+    """Semantic cache entries only match searches with the same embedding model and settings"""
+    scope = f"{SEMANTIC_CACHE_MODEL}|{model}|{num_results}|{temperature:.2f}"
+    return scope + "|light" if lightweight else scope
+
+async def embed_query(query: str) -> Optional[List[float]]:
+    """Embed a query with SEMANTIC_CACHE_MODEL; None if no backend can do it right now"""
+    backends = ollama_pool.candidates(SEMANTIC_CACHE_MODEL)
+    if not backends:
+        return None
+    with STAGE_SECONDS.time(stage="embed", model=model_label(SEMANTIC_CACHE_MODEL)) as labels:
+        try:
+            response = await backends[0].client.post(
+                "/api/embed",
+                json={"model": SEMANTIC_CACHE_MODEL, "input": query, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=EMBED_TIMEOUT
+            )
+            if response.status_code == 200:
+                return response.json()["embeddings"][0]
+        except (httpx.HTTPError, ValueError, KeyError, IndexError):
+            pass
+        labels["status"] = "error"
+        return None
+
+async def lookup_cached_results(query: str, model: str, num_results: int, temperature: float,
+                                lightweight: bool = False) -> Tuple[Optional[List[Dict]], Optional[List[float]]]:
+    """
+    Cached results for a search: an exact match first, then a semantic
+    match. Also returns the query embedding, if one was computed, so a
+    miss can be added to the semantic cache without embedding it again.
+    """
+    cache_key = make_cache_key(query, model, num_results, temperature, lightweight)
+    if result_cache:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached, None
+    if not semantic_cache:
+        return None, None
+    
+    embedding = await embed_query(query)
+    if embedding is None:
+        SEMANTIC_LOOKUPS.inc(outcome="unavailable")
+        return None, None
+    match = semantic_cache.get(semantic_scope(model, num_results, temperature, lightweight), embedding)
+    if match is None:
+        SEMANTIC_LOOKUPS.inc(outcome="miss")
+        return None, embedding
+    
+    SEMANTIC_LOOKUPS.inc(outcome="hit")
+    results = match[0]
+    # Repeats of this exact query can skip the embedding next time
+    if result_cache:
+        result_cache.set(cache_key, results)
+    return results, embedding
+
+def cache_results(query: str, model: str, num_results: int, temperature: float,
+                  results: List[Dict], embedding: Optional[List[float]], lightweight: bool = False):
+    """Store freshly generated results in the exact and semantic caches"""
+    cache_key = make_cache_key(query, model, num_results, temperature, lightweight)
+    if result_cache:
+        result_cache.set(cache_key, results)
+    if semantic_cache and embedding is not None:
+        scope = semantic_scope(model, num_results, temperature, lightweight)
+        semantic_cache.set(cache_key, scope, query, embedding, results)
+
+async def get_search_results(query: str, model: str, num_results: int, temperature: float,
+                             lightweight: bool = False) -> Tuple[List[SearchResult], bool]:
+    """
+    Return search results from the cache when possible, generating and
+    caching them otherwise. The second value says whether it was a cache hit.
+    
+    Concurrent misses for the same key await a single shared generation.
+    """
+    cached, embedding = await lookup_cached_results(query, model, num_results, temperature, lightweight)
+    if cached is not None:
+        return [SearchResult(**r) for r in cached], True
     
-    for block in result_blocks:
-        if not block.strip():
+    async def generate() -> List[SearchResult]:
+        check_generation_available(model)
+        results = await generate_search_results(query, model, num_results, temperature, lightweight)
+        if results:
+            cache_results(query, model, num_results, temperature,
+                          [r.model_dump() for r in results], embedding, lightweight)
+        return results
+    
+    cache_key = make_cache_key(query, model, num_results, temperature, lightweight)
+    results = await search_flights.do(cache_key, generate)
+    # Every waiter gets its own copies, since callers adjust confidence in place
+    return [r.model_copy() for r in results], False
+
+async def cascade_search_results(query: str, num_results: int, temperature: float, risk_analysis: dict,
+                                 lightweight: bool = False) -> Tuple[List[SearchResult], bool, str, int]:
+    """
+    Answer a search with the smallest cascade tier that gives a reliable
+    answer. Returns the results, whether they were cached, and the model
+    and tier that answered. An unavailable tier passes the search on to
+    the next one; if the largest is unavailable, the answer from the tier
+    below stands.
+    """
+    tier = cascade_policy.first_tier(risk_analysis)
+    escalations = [(cascade_policy.models[0], "query_risk")] if tier else []
+    answer = None
+    while True:
+        model = cascade_policy.models[tier]
+        try:
+            results, cached = await get_search_results(query, model, num_results, temperature, lightweight)
+        except HTTPException as e:
+            # A tier that is overloaded, down or not installed is skipped
+            if e.status_code not in (404, 503) or (answer is None and tier + 1 == len(cascade_policy.models)):
+                raise
+            if answer is not None:
+                break
+            escalations.append((model, "unavailable"))
+            tier += 1
             continue
-            
+        
+        answer = (results, cached, model, tier)
+        if tier + 1 == len(cascade_policy.models):
+            break
+        reason = cascade_policy.escalation_reason(
+            [r.confidence for r in results], [r.hallucination_risk for r in results]
+        )
+        if reason is None:
+            break
+        escalations.append((model, reason))
+        tier += 1
+    
+    cascade_policy.record(answer[2], escalations)
+    CASCADE_ANSWERS.inc(model=model_label(answer[2]))
+    for model, reason in escalations:
+        CASCADE_ESCALATIONS.inc(model=model_label(model), reason=reason)
+    return answer
+
+def build_search_result(title: str, snippet: str, relevance: int, expanded: Optional[str]) -> SearchResult:
+    """Score a parsed result (whitespace already normalized) and wrap it in a SearchResult"""
+    # Calculate risk once, then confidence from it
+    full_text = f"{title} {snippet} {expanded or ''}"
+    risk = detect_hallucination_risk(full_text)
+    confidence = calculate_confidence(full_text, relevance, risk)
+    
+    return SearchResult(
+        title=title,
+        snippet=snippet,
+        confidence=confidence,
+        relevance_score=min(10, max(1, relevance)),
+        expanded_content=expanded,
+        hallucination_risk=risk
+    )
+
+def record_parse(model: str, mode: str, expected: int, parsed: int, failed: int = 0, recovered: int = 0):
+    """Count one parsed model output in /stats and /metrics"""
+    parse_stats.add(model, mode, expected, parsed, failed, recovered)
+    outcome = "complete" if parsed >= expected else ("partial" if parsed else "empty")
+    PARSE_OUTPUTS.inc(model=model_label(model), mode=mode, outcome=outcome)
+
+def decode_structured_results(text: str, lightweight: bool = False) -> Optional[Tuple[List[ParsedBlock], int]]:
+    """
+    Decode structured output into parsed blocks plus a count of results
+    that failed validation. Returns None if the output is not the
+    expected JSON object at all.
+    """
+    try:
+        items = json.loads(text)["results"]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if not isinstance(items, list):
+        return None
+    
+    schema = GeneratedSummary if lightweight else GeneratedResult
+    blocks, failed = [], 0
+    for item in items:
         try:
-            # Extract fields using regex
-            title_match = re.search(r'TITLE:\s*(.+?)(?:\n|$)', block, re.IGNORECASE)
-            snippet_match = re.search(r'SNIPPET:\s*(.+?)(?=\n(?:RELEVANCE|EXPANDED|$))', block, re.IGNORECASE | re.DOTALL)
-            relevance_match = re.search(r'RELEVANCE:\s*(\d+)', block, re.IGNORECASE)
-            expanded_match = re.search(r'EXPANDED:\s*(.+?)(?=\n(?:RESULT|$)|$)', block, re.IGNORECASE | re.DOTALL)
-            
-            if title_match and snippet_match and relevance_match:
-                title = title_match.group(1).strip()
-                snippet = snippet_match.group(1).strip()
-                relevance = int(relevance_match.group(1))
-                expanded = expanded_match.group(1).strip() if expanded_match else None
-                
-                # Clean up text
-                snippet = re.sub(r'\s+', ' ', snippet)
-                if expanded:
-                    expanded = re.sub(r'\s+', ' ', expanded)
-                
-                # Calculate confidence and risk
-                full_text = f"{title} {snippet} {expanded or ''}"
-                confidence = calculate_confidence(full_text, relevance)
-                risk = detect_hallucination_risk(full_text)
-                
-                results.append(SearchResult(
-                    title=title,
-                    snippet=snippet,
-                    confidence=confidence,
-                    relevance_score=min(10, max(1, relevance)),
-                    expanded_content=expanded,
-                    hallucination_risk=risk
-                ))
-        except Exception as e:
-            print(f"Failed to parse result block: {e}")
+            result = schema.model_validate(item)
+        except ValidationError:
+            failed += 1
             continue
+        blocks.append(ParsedBlock(
+            " ".join(result.title.split()),
+            " ".join(result.snippet.split()),
+            result.relevance_score,
+            None if lightweight else " ".join(result.expanded_content.split()) or None
+        ))
+    return blocks, failed
+
+def parse_search_results(text: str, expected_count: int, model: str, structured: bool = False,
+                         lightweight: bool = False) -> List[SearchResult]:
+    """
+    Parse LLM output into structured results. Structured output that does
+    not decode as JSON goes through the text parser instead, so a model
+    that ignores the schema still yields whatever results it wrote.
+    """
+    decoded = decode_structured_results(text, lightweight) if structured else None
+    if structured:
+        record_structured_outcome(model, decoded is not None)
+    
+    if decoded is not None:
+        blocks, failed = decoded
+        record_parse(model, "structured", expected_count, len(blocks), failed)
+    else:
+        parser = ResultStreamParser()
+        blocks = parser.feed(text) + parser.close()
+        record_parse(model, "fallback" if structured else "text", expected_count,
+                     parser.parsed, parser.failed, parser.recovered)
+    
+    results = [build_search_result(*block) for block in blocks]
     
     # Sort by relevance and confidence
     results.sort(key=lambda x: (x.relevance_score, x.confidence), reverse=True)
@@ -484,6 +1447,279 @@ def parse_search_results(text: str, expected_count: int) -> List[SearchResult]:
     # Ensure we return the requested number (or fewer if not enough quality results)
     return results[:expected_count] if results else []
 
+async def stream_search_results(query: str, model: str, num_results: int, temperature: float,
+                                lightweight: bool = False) -> AsyncIterator[SearchResult]:
+    """
+    Stream search results from Ollama, yielding each result as soon as
+    its RESULT block has been fully generated. Always uses the text
+    layout, which can be parsed block by block as it arrives.
+    """
+    payload = build_generate_payload(query, model, num_results, temperature, stream=True, lightweight=lightweight)
+    
+    def on_done(chunk: Dict):
+        remember_context(query, model, num_results, temperature, chunk, lightweight)
+    
+    async for result in stream_generated_results(model, payload, num_results, on_done):
+        yield result
+
+async def stream_generated_results(model: str, payload: Dict, num_results: int,
+                                   on_done: Optional[Callable[[Dict], None]] = None,
+                                   accept: Optional[Callable[[SearchResult], bool]] = None
+                                   ) -> AsyncIterator[SearchResult]:
+    """
+    Run a streaming text-layout generation and yield up to num_results
+    results as their blocks complete, then stop Ollama. on_done receives
+    Ollama's final chunk if it arrives; results that accept() rejects are
+    dropped and do not count.
+    """
+    parser = ResultStreamParser()
+    emitted = 0
+    grace = 0
+    parse_time = 0.0
+    
+    def take(blocks: List[ParsedBlock]) -> List[SearchResult]:
+        results = [build_search_result(*block) for block in blocks]
+        if accept:
+            results = [r for r in results if accept(r)]
+        return results[:num_results - emitted]
+    
+    try:
+        attempt = await start_generation(model, payload)
+        try:
+            while True:
+                chunk = await attempt.next_chunk()
+                if chunk is None:
+                    break
+                if chunk.get("error"):
+                    raise HTTPException(status_code=500, detail=f"Generation failed: {chunk['error']}")
+                parse_started = time.perf_counter()
+                blocks = parser.feed(chunk.get("response", ""))
+                if chunk.get("done"):
+                    record_generation_stats(model, chunk)
+                    if on_done:
+                        on_done(chunk)
+                    blocks += parser.close()
+                results = take(blocks)
+                parse_time += time.perf_counter() - parse_started
+                
+                # Emit every block the parser has completed
+                for result in results:
+                    emitted += 1
+                    yield result
+                
+                if chunk.get("done"):
+                    break
+                if emitted >= num_results:
+                    # Wait briefly for the final chunk, whose context /expand and /search/more continue
+                    if on_done and grace < CONTEXT_GRACE_CHUNKS:
+                        grace += 1
+                        continue
+                    # Closing the stream makes Ollama stop generating
+                    OLLAMA_STOPS.inc(model=model_label(model), reason="early")
+                    break
+        except BaseException:
+            await attempt.cancel()
+            raise
+        await attempt.stop()
+    
+    except (BackendUnavailable, AdmissionRejected) as e:
+        raise backend_unavailable_error(e)
+    
+    # The final block may not be followed by a delimiter
+    parse_started = time.perf_counter()
+    results = take(parser.close())
+    parse_time += time.perf_counter() - parse_started
+    record_parse(model, "text", num_results, parser.parsed, parser.failed, parser.recovered)
+    STAGE_SECONDS.observe(parse_time, stage="parse", model=model_label(model), status="ok")
+    for result in results:
+        yield result
+
+async def search_cursor(query_data: SearchQuery, model: str, results: List[SearchResult]) -> str:
+    """Cursor for the page after a search's results, continuing its Ollama context if this worker kept it"""
+    context, structured = find_context(
+        query_data.query, model, query_data.num_results, query_data.temperature, query_data.lightweight
+    )
+    return await create_cursor(query_data.query, model, query_data.num_results, query_data.temperature,
+                               query_data.lightweight, [r.title for r in results], context, structured)
+
+async def create_cursor(query: str, model: str, num_results: int, temperature: float, lightweight: bool,
+                        titles: Sequence[str], context: Optional[List[int]], structured: bool = False) -> str:
+    """Store where a search left off and return the opaque cursor id for it"""
+    cursor_id = secrets.token_urlsafe(16)
+    cursor = SearchCursor(
+        query, model, num_results, temperature, lightweight, tuple(titles),
+        array("l", context) if context else None, structured
+    )
+    search_cursors.set(cursor_id, cursor)
+    if shared_state:
+        await run_sqlite(shared_state.set_cursor, cursor_id, cursor._replace(context=None, structured=False)._asdict(),
+                         CURSOR_TTL, CURSOR_MAX_ENTRIES)
+    return cursor_id
+
+async def load_cursor(cursor_id: str) -> Optional[SearchCursor]:
+    """
+    A cursor handed out by this worker, or by another one through shared
+    state. Only the worker that made a cursor holds its Ollama context.
+    """
+    cursor = search_cursors.get(cursor_id)
+    if cursor is None and shared_state:
+        data = await run_sqlite(shared_state.get_cursor, cursor_id)
+        if data is not None:
+            cursor = SearchCursor(**{**data, "titles": tuple(data["titles"])})
+    return cursor
+
+async def generate_more_results(cursor: SearchCursor, num_results: int
+                                ) -> Tuple[List[SearchResult], Optional[List[int]], bool]:
+    """
+    Generate the next page for a cursor, returning it with the new Ollama
+    context and whether that context ends in JSON output. With a stored
+    context the model continues its own output, so only the short
+    continuation prompt and the new results cost tokens; a context from
+    structured output is continued with the same schema. Without one the
+    search is re-prompted with the titles served so far. Titles already
+    served are dropped either way.
+    """
+    seen = {normalize_query(title) for title in cursor.titles}
+    
+    def accept(result: SearchResult) -> bool:
+        title = normalize_query(result.title)
+        if title in seen:
+            return False
+        seen.add(title)
+        return True
+    
+    try:
+        structured = cursor.structured if cursor.context is not None else use_structured_output(cursor.model)
+        result = None
+        if structured:
+            if cursor.context is not None:
+                payload = more_results_payload(cursor, num_results, structured=True)
+            else:
+                payload = build_generate_payload(cursor.query, cursor.model, num_results, cursor.temperature,
+                                                 stream=False, structured=True, lightweight=cursor.lightweight,
+                                                 exclude_titles=cursor.titles)
+            result = await request_structured(cursor.model, payload)
+        if result is not None:
+            with STAGE_SECONDS.time(stage="parse", model=model_label(cursor.model)):
+                results = [
+                    r for r in parse_search_results(result.get("response", ""), num_results, cursor.model,
+                                                    structured=True, lightweight=cursor.lightweight)
+                    if accept(r)
+                ]
+            return results, result.get("context"), True
+        
+        # A JSON context can't be continued in the text layout, so re-prompt instead
+        if cursor.context is not None and not cursor.structured:
+            payload = more_results_payload(cursor, num_results)
+        else:
+            payload = build_generate_payload(cursor.query, cursor.model, num_results, cursor.temperature,
+                                             stream=True, lightweight=cursor.lightweight,
+                                             exclude_titles=cursor.titles)
+        final: Dict = {}
+        results = [
+            result async for result in
+            stream_generated_results(cursor.model, payload, num_results, final.update, accept)
+        ]
+    except HTTPException:
+        raise
+    except (BackendUnavailable, AdmissionRejected) as e:
+        raise backend_unavailable_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    
+    results.sort(key=lambda x: (x.relevance_score, x.confidence), reverse=True)
+    return results, final.get("context"), False
+
+def more_results_payload(cursor: SearchCursor, num_results: int, structured: bool = False) -> Dict:
+    """An /api/generate request continuing a cursor's Ollama context"""
+    payload = {
+        "model": cursor.model,
+        "prompt": construct_more_prompt(num_results, len(cursor.titles) + 1, cursor.lightweight, structured),
+        "context": cursor.context.tolist(),
+        "options": {"temperature": cursor.temperature},
+        "keep_alive": keep_alive_for(cursor.model),
+        "stream": not structured
+    }
+    budget = token_budget(num_results, cursor.lightweight)
+    if budget:
+        payload["options"]["num_predict"] = budget
+    if structured:
+        payload["format"] = structured_output_schema(num_results, cursor.lightweight)
+    return payload
+
+def construct_expand_prompt(user_query: str, title: str, snippet: str) -> str:
+    """
+    Prompt for one result's expanded text, sent after the static system
+    prefix like a search when there is no search context to continue
+    """
+    return f"""═══════════════════════════════════════════════════════════════
+NOW EXPAND THIS SEARCH RESULT
+═══════════════════════════════════════════════════════════════
+
+Remember your constitution. Follow the quality standards. Be honest about uncertainty.
+
+User Query: "{user_query}"
+
+TITLE: {title}
+SNIPPET: {snippet}
+
+{expand_instructions(title)}"""
+
+def expand_instructions(title: str) -> str:
+    """The request for expanded text; on its own it continues a lightweight search's context"""
+    return f"""Write the EXPANDED text for the result titled "{title}": 4-6 sentences with deeper detail than its snippet. Include caveats if uncertain. Write only that text, with no labels and no other results.
+
+EXPANDED:"""
+
+# A label the model may repeat at the start of its expanded text
+_EXPANDED_LABEL = re.compile(r"^[*#>_\-\s]*EXPANDED[*_\s]*:[*_\s]*", re.IGNORECASE)
+
+async def generate_expansion(query: str, title: str, snippet: str, model: str,
+                             num_results: int, temperature: float) -> Tuple[str, bool]:
+    """
+    Generate the expanded text for one result. Continues the Ollama
+    context of the lightweight search the result came from when this
+    worker still holds it, so Ollama only evaluates the new instruction.
+    Returns the text and whether the context was reused.
+    """
+    context, _ = find_context(query, model, num_results, temperature, lightweight=True)
+    payload = {
+        "model": model,
+        "options": {
+            "temperature": temperature,
+            "num_predict": EXPAND_MAX_TOKENS,
+            # Stop if the model carries on into another result
+            "stop": ["---", "\nRESULT", "\nTITLE:"]
+        },
+        "keep_alive": keep_alive_for(model),
+        "stream": False
+    }
+    if context:
+        payload.update(prompt=expand_instructions(title), context=context)
+    else:
+        payload.update(system=STATIC_SYSTEM_PROMPT, prompt=construct_expand_prompt(query, title, snippet))
+    
+    try:
+        async with generation_slot(model) as backend:
+            with STAGE_SECONDS.time(stage="expand", model=model_label(model)):
+                response = await backend.client.post("/api/generate", json=payload)
+            # Raised inside the lease so the circuit breaker counts the failure
+            if response.status_code != 200:
+                raise HTTPException(status_code=500, detail="Ollama request failed")
+            result = response.json()
+    except HTTPException:
+        raise
+    except (BackendUnavailable, AdmissionRejected) as e:
+        raise backend_unavailable_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+    
+    record_generation_stats(model, result)
+    expanded = " ".join(_EXPANDED_LABEL.sub("", result.get("response", "").strip()).split())
+    if not expanded:
+        raise HTTPException(status_code=500, detail="Generation failed: no expanded text")
+    return expanded, context is not None
+
 @app.get("/")
 async def root():
     return {
@@ -493,92 +1729,222 @@ async def root():
         "endpoints": {
             "/health": "Check system health",
             "/search": "Perform a search (POST)",
-            "/models": "List available models"
+            "/search/stream": "Perform a search, streaming results as NDJSON (POST)",
+            "/search/batch": "Run many searches, streaming responses as NDJSON (POST)",
+            "/search/more": "Continue a search from its cursor with the next page of results (POST)",
+            "/expand": "Generate the expanded text for one result of a lightweight search (POST)",
+            "/suggest": "Complete a partly typed query from earlier searches (?q=)",
+            "/models": "List available models",
+            "/stats": "Usage statistics (JSON)",
+            "/metrics": "Prometheus metrics"
         }
     }
 
 @app.get("/health")
 async def health_check():
-    """Check if the system is healthy"""
-    ollama_status = await check_ollama_health()
-    return {
-        "status": "healthy" if ollama_status["status"] == "healthy" else "degraded",
-        "ollama": ollama_status,
+    """Check if the system is healthy. Answers 503 until the default model is warm on a backend."""
+    healthy = all(b.healthy for b in ollama_pool.backends)
+    ready = warmup_complete()
+    status = {
+        "status": ("healthy" if healthy else "degraded") if ready else "warming_up",
+        "ready": ready,
+        "warmup": warmup_state,
+        "ollama": ollama_pool.status(),
         "timestamp": datetime.now().isoformat()
     }
+    if not ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 @app.get("/models")
 async def list_models():
     """Get available Ollama models"""
-    ollama_status = await check_ollama_health()
-    if ollama_status["status"] == "healthy":
-        models = ollama_status["models"].get("models", [])
+    if ollama_pool.healthy:
         return {
-            "models": [m["name"] for m in models],
+            "models": ollama_pool.models,
             "default": DEFAULT_MODEL
         }
     else:
         raise HTTPException(status_code=503, detail="Ollama not available")
 
-@app.post("/search", response_model=SearchResponse)
-async def search(query_data: SearchQuery, request: Request):
-    """
-    Perform a parametric search using only LLM knowledge
-    """
-    start_time = time.time()
-    
+def build_query_warning(risk_analysis: dict) -> Optional[str]:
+    """Enhanced warning system using risk analysis"""
+    if risk_analysis['should_warn']:
+        if 'recent_events' in risk_analysis['detected_risks']:
+            return "This query asks about recent events. My knowledge has a cutoff date and may be outdated."
+        elif 'real_time_data' in risk_analysis['detected_risks']:
+            return "This query typically requires real-time data. Results are based on historical training knowledge only."
+        elif 'specialized' in risk_analysis['detected_risks']:
+            return "This query involves specialized knowledge. Results may be incomplete or require expert verification."
+    return None
+
+def apply_risk_penalty(result: SearchResult, risk_analysis: dict) -> SearchResult:
+    """Apply confidence penalties based on risk analysis"""
+    if risk_analysis['confidence_penalty'] > 0:
+        result.confidence = max(0.0, result.confidence - risk_analysis['confidence_penalty'])
+    return result
+
+async def validate_search_request(query_data: SearchQuery, request: Request):
+    """Rate limit and validate a search request"""
     # Rate limiting
     client_ip = request.client.host
-    if not rate_limit_check(client_ip):
+    if not await rate_limit_check(client_ip, query_data.model):
         raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a minute.")
     
-    # Validate query
+    validate_query(query_data)
+
+def validate_query(query_data: SearchQuery):
+    """Validate the query text"""
     if not query_data.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
     if len(query_data.query) > 500:
         raise HTTPException(status_code=400, detail="Query too long (max 500 characters)")
     
-    # Check Ollama health
-    ollama_status = await check_ollama_health()
-    if ollama_status["status"] != "healthy":
-        raise HTTPException(status_code=503, detail="Search engine unavailable (Ollama not running)")
-    
-    # Generate results
+    if query_data.cascade and not cascade_policy:
+        raise HTTPException(status_code=400, detail="Cascade mode is not configured (set PARASEARCH_CASCADE_MODELS)")
+
+def check_generation_available(model: str):
+    """Fail fast if no healthy Ollama backend can serve the model or its queue is full"""
     try:
-        results = await generate_search_results(
-            query_data.query,
-            query_data.model,
-            query_data.num_results,
-            query_data.temperature
+        ollama_pool.check(model)
+        admission.check(model)
+    except (BackendUnavailable, AdmissionRejected) as e:
+        raise backend_unavailable_error(e)
+
+T = TypeVar("T")
+
+def request_deadline(request: Request) -> float:
+    """
+    time.monotonic() deadline for a request: X-Request-Timeout seconds if
+    the client sent it, else REQUEST_TIMEOUT, capped at REQUEST_TIMEOUT_MAX
+    """
+    timeout = REQUEST_TIMEOUT
+    header = request.headers.get("x-request-timeout")
+    if header is not None:
+        try:
+            timeout = float(header)
+        except ValueError:
+            timeout = 0.0
+        if not timeout > 0:
+            raise HTTPException(status_code=400, detail="X-Request-Timeout must be a positive number of seconds")
+    return time.monotonic() + min(timeout, REQUEST_TIMEOUT_MAX)
+
+def deadline_exceeded_error() -> HTTPException:
+    return HTTPException(status_code=504, detail="Search deadline exceeded")
+
+async def wait_for_disconnect(request: Request):
+    """Return once the client has closed the connection"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+async def run_until_deadline(request: Request, work: Awaitable[T], deadline: float) -> T:
+    """
+    Await work, cancelling it if the deadline passes (504) or the client
+    disconnects first (499). Cancelling a search cancels its Ollama
+    generation, unless other requests are waiting on the same one.
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {task, watcher}, timeout=max(0.0, deadline - time.monotonic()),
+            return_when=asyncio.FIRST_COMPLETED
         )
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    
+    if task in done:
+        return task.result()
+    if watcher in done:
+        raise HTTPException(status_code=499, detail="Client closed request")
+    raise deadline_exceeded_error()
+
+async def iterate_until_deadline(results: AsyncIterator[T], deadline: float) -> AsyncIterator[T]:
+    """Yield from results, raising a 504 if the next item isn't ready by the deadline"""
+    iterator = results.__aiter__()
+    while True:
+        try:
+            item = await asyncio.wait_for(iterator.__anext__(), max(0.0, deadline - time.monotonic()))
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise deadline_exceeded_error()
+        yield item
+
+# Queries never offered to other users as suggestions: personal ones, and
+# the "specialized" kind, which covers medical and legal questions
+UNSUGGESTABLE_RISKS = {"personal", "specialized"}
+
+def record_served_query(query: str, results: Sequence[SearchResult], client: str):
+    """Count a search that returned results towards /suggest"""
+    if suggestion_index and results and not UNSUGGESTABLE_RISKS.intersection(scan_query(query)):
+        suggestion_index.record(query, client)
+
+@app.post("/search", response_model=SearchResponse)
+async def search(query_data: SearchQuery, request: Request):
+    """
+    Perform a parametric search using only LLM knowledge.
+    
+    The search is cancelled if it runs past its deadline or the client
+    disconnects while it waits.
+    """
+    with REQUEST_SECONDS.time(endpoint="search", model=model_label(query_data.model)) as labels:
+        try:
+            deadline = request_deadline(request)
+            await validate_search_request(query_data, request)
+            response = await run_until_deadline(request, run_search(query_data), deadline)
+            record_served_query(query_data.query, response.results, request.client.host)
+            labels["status"] = "200"
+            return response
+        except HTTPException as e:
+            labels["status"] = str(e.status_code)
+            raise
+
+async def run_search(query_data: SearchQuery, with_cursor: bool = True) -> SearchResponse:
+    """Run one validated search and build its response"""
+    start_time = time.time()
+    risk_analysis = analyze_query_risk(query_data.query)
+    
+    # Generate results (or serve them from the cache)
+    try:
+        if query_data.cascade:
+            results, cached, model_used, tier = await cascade_search_results(
+                query_data.query, query_data.num_results, query_data.temperature, risk_analysis,
+                query_data.lightweight
+            )
+        else:
+            results, cached = await get_search_results(
+                query_data.query,
+                query_data.model,
+                query_data.num_results,
+                query_data.temperature,
+                query_data.lightweight
+            )
+            model_used, tier = query_data.model, None
         
         processing_time = time.time() - start_time
         
-        # Enhanced warning system using risk analysis
-        risk_analysis = analyze_query_risk(query_data.query)
-        warning = None
-        
-        if risk_analysis['should_warn']:
-            if 'recent_events' in risk_analysis['detected_risks']:
-                warning = "This query asks about recent events. My knowledge has a cutoff date and may be outdated."
-            elif 'real_time_data' in risk_analysis['detected_risks']:
-                warning = "This query typically requires real-time data. Results are based on historical training knowledge only."
-            elif 'specialized' in risk_analysis['detected_risks']:
-                warning = "This query involves specialized knowledge. Results may be incomplete or require expert verification."
+        warning = build_query_warning(risk_analysis)
         
-        # Apply confidence penalties based on risk analysis
         for result in results:
-            if risk_analysis['confidence_penalty'] > 0:
-                result.confidence = max(0.0, result.confidence - risk_analysis['confidence_penalty'])
+            apply_risk_penalty(result, risk_analysis)
         
         return SearchResponse(
             query=query_data.query,
             results=results,
             processing_time=round(processing_time, 2),
-            model_used=query_data.model,
-            knowledge_cutoff="January 2025 (approximate - varies by model)",
-            warning=warning
+            model_used=model_used,
+            knowledge_cutoff=KNOWLEDGE_CUTOFF,
+            warning=warning,
+            cached=cached,
+            cascade_tier=tier,
+            cursor=await search_cursor(query_data, model_used, results) if with_cursor and results else None
         )
         
     except HTTPException:
@@ -586,23 +1952,414 @@ async def search(query_data: SearchQuery, request: Request):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+@app.post("/search/stream")
+async def search_stream(query_data: SearchQuery, request: Request):
+    """
+    Perform a parametric search, streaming each result as NDJSON as soon
+    as the model finishes it.
+    
+    Emits one JSON object per line:
+      {"type": "meta", ...}    - query, model and warning, sent immediately
+      {"type": "result", ...}  - one scored result
+      {"type": "done", ...}    - total count, processing time and the /search/more cursor
+      {"type": "error", ...}   - generation failed mid-stream or passed the deadline
+    
+    A cascade search only knows which model answers once the cascade has
+    settled, so its results arrive together and "done" names the model
+    and tier (meta's model_used is null).
+    
+    A client disconnect cancels the response stream, and with it the
+    Ollama generation.
+    """
+    start_time = time.time()
+    request_started = time.perf_counter()
+    label = model_label(query_data.model)
+    
+    try:
+        deadline = request_deadline(request)
+        await validate_search_request(query_data, request)
+        if query_data.cascade:
+            cached, embedding = None, None
+        else:
+            cached, embedding = await lookup_cached_results(
+                query_data.query, query_data.model, query_data.num_results, query_data.temperature,
+                query_data.lightweight
+            )
+            if cached is None:
+                check_generation_available(query_data.model)
+    except HTTPException as e:
+        REQUEST_SECONDS.observe(time.perf_counter() - request_started,
+                                endpoint="stream", model=label, status=str(e.status_code))
+        raise
+    
+    risk_analysis = analyze_query_risk(query_data.query)
+    cascade_answer: Dict = {}
+    
+    async def generate_results() -> AsyncIterator[SearchResult]:
+        if query_data.cascade:
+            results, was_cached, model, tier = await cascade_search_results(
+                query_data.query, query_data.num_results, query_data.temperature, risk_analysis,
+                query_data.lightweight
+            )
+            cascade_answer.update(model_used=model, cascade_tier=tier, cached=was_cached)
+            for result in results:
+                yield result
+            return
+        
+        if cached is not None:
+            for r in cached:
+                yield SearchResult(**r)
+            return
+        
+        generated = []
+        async for result in stream_search_results(
+            query_data.query,
+            query_data.model,
+            query_data.num_results,
+            query_data.temperature,
+            query_data.lightweight
+        ):
+            generated.append(result.model_dump())
+            yield result
+        
+        if generated:
+            cache_results(query_data.query, query_data.model, query_data.num_results,
+                          query_data.temperature, generated, embedding, query_data.lightweight)
+    
+    async def event_stream():
+        with REQUEST_SECONDS.time(endpoint="stream", model=label) as labels:
+            async for line in stream_events(labels):
+                yield line
+    
+    async def stream_events(labels: Dict[str, str]):
+        yield json.dumps({
+            "type": "meta",
+            "query": query_data.query,
+            "model_used": None if query_data.cascade else query_data.model,
+            "knowledge_cutoff": KNOWLEDGE_CUTOFF,
+            "warning": build_query_warning(risk_analysis),
+            "cached": cached is not None
+        }) + "\n"
+        
+        served = []
+        try:
+            async for result in iterate_until_deadline(generate_results(), deadline):
+                served.append(result)
+                apply_risk_penalty(result, risk_analysis)
+                yield json.dumps({
+                    "type": "result",
+                    "index": len(served),
+                    "result": result.model_dump(),
+                    "elapsed": round(time.time() - start_time, 2)
+                }) + "\n"
+        except HTTPException as e:
+            labels["status"] = str(e.status_code)
+            yield json.dumps({"type": "error", "detail": e.detail}) + "\n"
+            return
+        except Exception as e:
+            labels["status"] = "500"
+            yield json.dumps({"type": "error", "detail": f"Generation failed: {str(e)}"}) + "\n"
+            return
+        
+        labels["status"] = "200"
+        record_served_query(query_data.query, served, request.client.host)
+        model = cascade_answer.get("model_used", query_data.model)
+        yield json.dumps({
+            "type": "done",
+            "count": len(served),
+            "processing_time": round(time.time() - start_time, 2),
+            "cursor": await search_cursor(query_data, model, served) if served else None,
+            **cascade_answer
+        }) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/search/batch")
+async def search_batch(batch: BatchSearchRequest, request: Request):
+    """
+    Run many searches with bounded parallelism, streaming one NDJSON line
+    per query in completion order. Meant for offline jobs.
+    
+    The call counts once against the rate limit, and every unique query
+    takes a token from the client's separate batch quota
+    (PARASEARCH_BATCH_MAX_REQUESTS per window); a batch over its quota
+    waits for tokens rather than failing. Its generations use the
+    background admission queue, behind interactive searches. Identical
+    queries (same cache key) are generated once and reported for every
+    index that asked for them. Searches rejected by admission control are
+    retried after their Retry-After delay, so a large batch waits for
+    capacity rather than failing.
+    
+    Emits one JSON object per line:
+      {"type": "result", "index": i, "response": {...}}    - SearchResponse for queries[i]
+      {"type": "error", "index": i, "status": s, "detail": ...}
+      {"type": "done", ...}                                - totals and processing time
+    """
+    start_time = time.time()
+    
+    if not await rate_limit_check(request.client.host):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a minute.")
+    if not batch.queries:
+        raise HTTPException(status_code=400, detail="Batch cannot be empty")
+    if len(batch.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {BATCH_MAX_QUERIES} queries)")
+    
+    parallelism = max(1, min(batch.parallelism or BATCH_DEFAULT_PARALLELISM, BATCH_MAX_PARALLELISM))
+    
+    # Deduplicate by cache key, remembering every index that wants each search
+    unique: Dict[str, SearchQuery] = {}
+    indexes: Dict[str, List[int]] = defaultdict(list)
+    for i, query_data in enumerate(batch.queries):
+        key = make_cache_key(query_data.query, query_data.model, query_data.num_results,
+                             query_data.temperature, query_data.lightweight)
+        if query_data.cascade:
+            key += "|cascade"
+        unique.setdefault(key, query_data)
+        indexes[key].append(i)
+    
+    semaphore = asyncio.Semaphore(parallelism)
+    completed: asyncio.Queue = asyncio.Queue()
+    
+    async def run_one(key: str, query_data: SearchQuery):
+        background_generation.set(True)
+        try:
+            async with semaphore:
+                await take_batch_token(request.client.host)
+                attempt = 0
+                while True:
+                    try:
+                        validate_query(query_data)
+                        outcome = await run_search(query_data, with_cursor=False)
+                        break
+                    except HTTPException as e:
+                        retry_after = (e.headers or {}).get("Retry-After")
+                        if e.status_code == 503 and retry_after and attempt < BATCH_MAX_RETRIES:
+                            attempt += 1
+                            await asyncio.sleep(min(float(retry_after), BATCH_MAX_RETRY_DELAY))
+                            continue
+                        outcome = e
+                        break
+        except Exception as e:
+            # Every search must queue an outcome, or the stream below never finishes
+            outcome = HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        await completed.put((key, outcome))
+    
+    tasks = [asyncio.create_task(run_one(key, query_data)) for key, query_data in unique.items()]
+    
+    async def event_stream():
+        succeeded = failed = 0
+        try:
+            for _ in range(len(tasks)):
+                key, outcome = await completed.get()
+                for i in indexes[key]:
+                    if isinstance(outcome, SearchResponse):
+                        succeeded += 1
+                        # Duplicates may differ in case or spacing; echo each index's own text
+                        response = outcome.model_copy(update={"query": batch.queries[i].query})
+                        line = {"type": "result", "index": i, "response": response.model_dump()}
+                    else:
+                        failed += 1
+                        line = {"type": "error", "index": i, "status": outcome.status_code, "detail": outcome.detail}
+                    yield json.dumps(line) + "\n"
+        finally:
+            # Stop outstanding searches if the client goes away
+            for task in tasks:
+                task.cancel()
+        
+        yield json.dumps({
+            "type": "done",
+            "total": len(batch.queries),
+            "unique": len(unique),
+            "succeeded": succeeded,
+            "failed": failed,
+            "processing_time": round(time.time() - start_time, 2)
+        }) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/search/more", response_model=SearchResponse)
+async def search_more(more: MoreResultsRequest, request: Request):
+    """
+    Return the next page of results for a cursor from an earlier search
+    response. The response carries a new cursor for the page after it;
+    a cursor stays valid until it expires, so a page can be retried.
+    """
+    with REQUEST_SECONDS.time(endpoint="more", model="other") as labels:
+        try:
+            deadline = request_deadline(request)
+            cursor = await load_cursor(more.cursor)
+            if cursor is None:
+                raise HTTPException(status_code=404, detail="Unknown or expired cursor")
+            labels["model"] = model_label(cursor.model)
+            if not await rate_limit_check(request.client.host, cursor.model):
+                raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a minute.")
+            response = await run_until_deadline(request, run_more(cursor, more.num_results or cursor.num_results), deadline)
+            labels["status"] = "200"
+            return response
+        except HTTPException as e:
+            labels["status"] = str(e.status_code)
+            raise
+
+async def run_more(cursor: SearchCursor, num_results: int) -> SearchResponse:
+    """Generate one page for a cursor and build its response"""
+    start_time = time.time()
+    check_generation_available(cursor.model)
+    results, context, structured = await generate_more_results(cursor, num_results)
+    
+    risk_analysis = analyze_query_risk(cursor.query)
+    for result in results:
+        apply_risk_penalty(result, risk_analysis)
+    
+    # A page that came back empty means the model has nothing more to add
+    next_cursor = await create_cursor(
+        cursor.query, cursor.model, cursor.num_results, cursor.temperature, cursor.lightweight,
+        cursor.titles + tuple(r.title for r in results), context, structured
+    ) if results else None
+    
+    return SearchResponse(
+        query=cursor.query,
+        results=results,
+        processing_time=round(time.time() - start_time, 2),
+        model_used=cursor.model,
+        knowledge_cutoff=KNOWLEDGE_CUTOFF,
+        warning=build_query_warning(risk_analysis),
+        cursor=next_cursor
+    )
+
+@app.post("/expand", response_model=ExpandResponse)
+async def expand(expand_request: ExpandRequest, request: Request):
+    """
+    Generate the expanded text for one result of a lightweight search.
+    Expansions are cached per result, and concurrent requests for the
+    same result share one generation. Requests that have to generate
+    count against a per-client expansion quota, separate from searches
+    (PARASEARCH_EXPAND_MAX_REQUESTS per window); cache hits are free.
+    """
+    with REQUEST_SECONDS.time(endpoint="expand", model=model_label(expand_request.model)) as labels:
+        try:
+            deadline = request_deadline(request)
+            if not expand_request.query.strip() or not expand_request.title.strip():
+                raise HTTPException(status_code=400, detail="Query and title cannot be empty")
+            if max(len(expand_request.query), len(expand_request.title), len(expand_request.snippet or "")) > 500:
+                raise HTTPException(status_code=400, detail="Query, title or snippet too long (max 500 characters)")
+            response = await run_until_deadline(request, run_expand(expand_request, request.client.host), deadline)
+            labels["status"] = "200"
+            return response
+        except HTTPException as e:
+            labels["status"] = str(e.status_code)
+            raise
+
+async def run_expand(expand_request: ExpandRequest, client_ip: str) -> ExpandResponse:
+    """Serve one expansion from the cache, or rate limit the client and generate it"""
+    start_time = time.time()
+    model = expand_request.model
+    key = make_expansion_key(expand_request.query, model, expand_request.title, expand_request.snippet or "")
+    
+    cached = result_cache.get(key) if result_cache else None
+    if cached is not None:
+        expanded, context_reused = cached["expanded_content"], False
+    else:
+        # Keyed apart from searches, since shared state keeps every bucket in one table
+        if not await rate_limit_check(f"expand:{client_ip}", model, expand_limiter):
+            raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a minute.")
+        check_generation_available(model)
+        expanded, context_reused = await search_flights.do(key, lambda: generate_expansion(
+            expand_request.query, expand_request.title, expand_request.snippet or "", model,
+            expand_request.num_results, expand_request.temperature
+        ))
+        if result_cache:
+            result_cache.set(key, {"expanded_content": expanded})
+    
+    return ExpandResponse(
+        query=expand_request.query,
+        title=expand_request.title,
+        expanded_content=expanded,
+        hallucination_risk=detect_hallucination_risk(expanded),
+        processing_time=round(time.time() - start_time, 2),
+        model_used=model,
+        cached=cached is not None,
+        context_reused=context_reused
+    )
+
+@app.get("/suggest")
+async def suggest(q: str = "", limit: int = SUGGEST_MAX_RESULTS):
+    """
+    Complete a partly typed query from earlier searches, most searched
+    first. Answered from memory, so it is cheap enough to call on every
+    keystroke and is not rate limited.
+    """
+    with REQUEST_SECONDS.time(endpoint="suggest", model="other") as labels:
+        if not suggestion_index:
+            labels["status"] = "404"
+            raise HTTPException(status_code=404, detail="Suggestions are disabled (set PARASEARCH_SUGGEST=true)")
+        if len(q) > 500:
+            labels["status"] = "400"
+            raise HTTPException(status_code=400, detail="Query too long (max 500 characters)")
+        suggestions = suggestion_index.suggest(q, max(1, min(limit, SUGGEST_MAX_RESULTS)))
+        labels["status"] = "200"
+        return {"query": q, "suggestions": suggestions}
+
 @app.get("/stats")
 async def get_stats():
     """Get simple usage statistics"""
-    total_requests = sum(len(reqs) for reqs in request_counts.values())
-    active_users = len([ip for ip, reqs in request_counts.items() if reqs])
+    limiter_stats = await run_sqlite(rate_limiter.stats) if shared_state else rate_limiter.stats()
     
     return {
-        "total_requests_last_minute": total_requests,
-        "active_users": active_users,
+        "total_requests_last_minute": limiter_stats["requests_in_window"],
+        "active_users": limiter_stats["active_clients"],
         "rate_limit_window": RATE_LIMIT_WINDOW,
-        "max_requests_per_window": MAX_REQUESTS_PER_WINDOW
+        "max_requests_per_window": MAX_REQUESTS_PER_WINDOW,
+        "rate_limiter": limiter_stats,
+        "cache": result_cache.stats() if result_cache else {"enabled": False},
+        "semantic_cache": semantic_cache.stats() if semantic_cache else {"enabled": False},
+        "search_contexts": search_contexts.stats(),
+        "search_cursors": search_cursors.stats(),
+        "sqlite_write_failures": dict(write_failures),
+        "suggestions": suggestion_index.stats() if suggestion_index else {"enabled": False},
+        "single_flight": search_flights.stats(),
+        "generation": get_generation_stats(),
+        "admission": admission.stats(),
+        "hedging": hedge_policy.stats() if hedge_policy else {"enabled": False},
+        "cascade": cascade_policy.stats() if cascade_policy else {"enabled": False},
+        "parser": parse_stats.stats()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: stage latency histograms, Ollama token counters and current load"""
+    BACKEND_HEALTHY.clear()
+    BACKEND_IN_FLIGHT.clear()
+    for backend in ollama_pool.backends:
+        BACKEND_HEALTHY.set(1 if backend.healthy else 0, backend=backend.url)
+        BACKEND_IN_FLIGHT.set(backend.in_flight, backend=backend.url)
+    
+    ADMISSION_ACTIVE.clear()
+    ADMISSION_QUEUED.clear()
+    for model, stats in admission.stats()["models"].items():
+        ADMISSION_ACTIVE.set(stats["active"], model=model_label(model))
+        ADMISSION_QUEUED.set(stats["queued"], model=model_label(model))
+    
+    if result_cache:
+        CACHE_ENTRIES.set(result_cache.stats()["entries"])
+    
+    for operation, failures in list(write_failures.items()):
+        SQLITE_WRITE_FAILURES.set(failures, operation=operation)
+    
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     print("🔍 Starting ParaSearch Backend...")
     print_config()
-    print(f"🌐 CORS enabled for public access")
+    print("🌐 CORS enabled for public access")
     print(f"⚡ Rate limit: {MAX_REQUESTS_PER_WINDOW} requests per {RATE_LIMIT_WINDOW}s")
-    uvicorn.run(app, host="0.0.0.0", port=BACKEND_PORT)
+    if BACKEND_WORKERS > 1:
+        if STATE_BACKEND != "sqlite":
+            print(f"⚠️  {BACKEND_WORKERS} workers with in-memory state: rate limits and caches are per worker")
+            print("   Set PARASEARCH_STATE_BACKEND=sqlite to share them")
+        print(f"⚠️  Generation slots are per worker: up to {BACKEND_WORKERS}x PARASEARCH_MODEL_CONCURRENCY per backend")
+        # Workers need an import string so each process can load the app
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        uvicorn.run("main:app", host=BACKEND_HOST, port=BACKEND_PORT, workers=BACKEND_WORKERS)
+    else:
+        uvicorn.run(app, host=BACKEND_HOST, port=BACKEND_PORT)
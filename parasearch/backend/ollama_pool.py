@@ -0,0 +1,159 @@
+"""
+ParaSearch Ollama Pool
+Routes generations across several Ollama backends by least outstanding requests
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Collection, Dict, List
+
+import httpx
+
+from health import HealthMonitor, CircuitBreaker
+
+
+class BackendUnavailable(Exception):
+    """No healthy backend can serve the requested model right now"""
+
+    def __init__(self, message: str, retry_after: int, model_missing: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.model_missing = model_missing
+
+
+class OllamaBackend:
+    """
+    One Ollama instance: its pooled client, cached health and model
+    inventory, circuit breaker and outstanding generation count.
+    """
+
+    def __init__(self, url: str,
+                 client_factory: Callable[[str], httpx.AsyncClient],
+                 probe: Callable[[httpx.AsyncClient], Awaitable[Dict]],
+                 health_interval: float, failure_threshold: int, reset_timeout: float):
+        self.url = url
+        self.client_factory = client_factory
+        self.client: httpx.AsyncClient = client_factory(url)
+        self.health = HealthMonitor(lambda: probe(self.client), health_interval)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        """Admitted to the pool: health polls pass and the breaker is not open"""
+        return self.health.healthy and self.breaker.ready()
+
+    def has_model(self, model: str) -> bool:
+        models = self.health.models
+        return model in models or f"{model}:latest" in models
+
+    async def start(self):
+        if self.client.is_closed:
+            self.client = self.client_factory(self.url)
+        await self.health.start()
+
+    async def stop(self):
+        await self.health.stop()
+        await self.client.aclose()
+
+    def status(self) -> Dict:
+        return {
+            "url": self.url,
+            "status": "healthy" if self.healthy else "unhealthy",
+            "health": self.health.status(),
+            "circuit_breaker": self.breaker.status(),
+            "models": self.health.models,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+
+class OllamaPool:
+    """
+    A set of Ollama backends. Each generation goes to the healthy backend
+    with the fewest outstanding generations that has the model. Backends
+    drop out of rotation when health polls fail or their circuit breaker
+    opens, and rejoin automatically once they recover.
+    """
+
+    def __init__(self, backends: List[OllamaBackend]):
+        self.backends = backends
+
+    @property
+    def healthy(self) -> bool:
+        return any(b.health.healthy for b in self.backends)
+
+    @property
+    def models(self) -> List[str]:
+        names = set()
+        for backend in self.backends:
+            names.update(backend.health.models)
+        return sorted(names)
+
+    async def start(self):
+        await asyncio.gather(*(b.start() for b in self.backends))
+
+    async def stop(self):
+        await asyncio.gather(*(b.stop() for b in self.backends))
+
+    def candidates(self, model: str, exclude: Collection[OllamaBackend] = ()) -> List[OllamaBackend]:
+        """Healthy backends with the model, least loaded first"""
+        candidates = [b for b in self.backends if b.healthy and b.has_model(model) and b not in exclude]
+        candidates.sort(key=lambda b: (b.in_flight, b.requests))
+        return candidates
+
+    def _unavailable(self, model: str) -> BackendUnavailable:
+        live = [b for b in self.backends if b.health.healthy]
+        if not live:
+            return BackendUnavailable("Search engine unavailable (Ollama not running)",
+                                      retry_after=max(1, int(self.backends[0].health.interval)))
+        if not any(b.has_model(model) for b in live):
+            return BackendUnavailable(f"Model '{model}' is not available on any Ollama backend",
+                                      retry_after=max(1, int(live[0].health.interval)),
+                                      model_missing=True)
+        return BackendUnavailable("Search engine temporarily unavailable (Ollama generations failing)",
+                                  retry_after=min(b.breaker.retry_after() for b in live))
+
+    def check(self, model: str):
+        """Raise BackendUnavailable if no backend could take a generation for model"""
+        if not self.candidates(model):
+            raise self._unavailable(model)
+
+    def acquire(self, model: str, exclude: Collection[OllamaBackend] = ()) -> OllamaBackend:
+        """Pick and reserve a backend for one generation, skipping those in exclude"""
+        for backend in self.candidates(model, exclude):
+            if backend.breaker.allow_request():
+                backend.in_flight += 1
+                backend.requests += 1
+                return backend
+        raise self._unavailable(model)
+
+    @asynccontextmanager
+    async def lease(self, model: str, exclude: Collection[OllamaBackend] = ()) -> AsyncIterator[OllamaBackend]:
+        """
+        Reserve a backend for the duration of a generation and feed the
+        outcome into its circuit breaker.
+        """
+        backend = self.acquire(model, exclude)
+        try:
+            yield backend
+        except (asyncio.CancelledError, GeneratorExit):
+            backend.breaker.release()
+            raise
+        except Exception:
+            backend.failures += 1
+            backend.breaker.record_failure()
+            raise
+        else:
+            backend.breaker.record_success()
+        finally:
+            backend.in_flight -= 1
+
+    def status(self) -> Dict:
+        return {
+            "status": "healthy" if self.healthy else "unhealthy",
+            "models": self.models,
+            "backends": [b.status() for b in self.backends]
+        }
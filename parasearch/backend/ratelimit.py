@@ -0,0 +1,126 @@
+"""
+ParaSearch Rate Limiting
+Constant-time token bucket limiter with a bounded client table
+"""
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from shared_state import SQLiteSharedState
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token bucket: each client may burst up to max_requests and
+    refills at max_requests per window.
+
+    Buckets live in an LRU-ordered table capped at max_clients. Clients
+    idle for a full window have a full bucket again, so they are dropped;
+    when the table is full the least recently seen client is evicted.
+    Request counts for /stats are kept in a per-second ring buffer, so
+    reading them never scans the client table.
+    """
+
+    def __init__(self, max_requests: int, window: float, max_clients: int):
+        self.capacity = float(max_requests)
+        self.window = window
+        self.refill_rate = max_requests / window  # tokens per second
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # ip -> [tokens, last_seen]
+        self._slots = max(1, int(window))
+        self._ring = [0] * self._slots
+        self._ring_seconds = [0] * self._slots
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+
+    def _evict_idle(self, now: float, limit: int = 2):
+        """Drop up to `limit` clients idle for a full window (amortized O(1))"""
+        for _ in range(limit):
+            if not self._buckets:
+                return
+            ip, bucket = next(iter(self._buckets.items()))
+            if now - bucket[1] < self.window:
+                return
+            del self._buckets[ip]
+
+    def _count(self, now: float):
+        second = int(now)
+        slot = second % self._slots
+        if self._ring_seconds[slot] != second:
+            self._ring_seconds[slot] = second
+            self._ring[slot] = 0
+        self._ring[slot] += 1
+
+    def allow(self, client_ip: str) -> bool:
+        now = time.time()
+        self._evict_idle(now)
+
+        bucket = self._buckets.get(client_ip)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+            bucket = [self.capacity, now]
+            self._buckets[client_ip] = bucket
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+            bucket[1] = now
+            self._buckets.move_to_end(client_ip)
+
+        if bucket[0] < 1.0:
+            self.rejected += 1
+            return False
+
+        bucket[0] -= 1.0
+        self.allowed += 1
+        self._count(now)
+        return True
+
+    def requests_in_window(self) -> int:
+        oldest = int(time.time()) - self._slots
+        return sum(
+            count for count, second in zip(self._ring, self._ring_seconds)
+            if second > oldest
+        )
+
+    def stats(self) -> Dict:
+        self._evict_idle(time.time(), limit=len(self._buckets))
+        return {
+            "requests_in_window": self.requests_in_window(),
+            "active_clients": len(self._buckets),
+            "max_clients": self.max_clients,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted": self.evicted
+        }
+
+
+class SharedTokenBucketLimiter:
+    """
+    Token bucket limiter whose buckets live in shared state, so limits
+    hold across every worker process instead of multiplying by N.
+    """
+
+    def __init__(self, state: SQLiteSharedState, max_requests: int, window: float, max_clients: int):
+        self.state = state
+        self.capacity = float(max_requests)
+        self.window = window
+        self.refill_rate = max_requests / window
+        self.max_clients = max_clients
+
+    def allow(self, client_ip: str) -> bool:
+        return self.state.take_token(
+            client_ip, self.capacity, self.refill_rate, self.window, self.max_clients
+        )
+
+    def stats(self) -> Dict:
+        counters = self.state.counters()
+        return {
+            **self.state.rate_stats(self.window),
+            "max_clients": self.max_clients,
+            "allowed": counters.get("rate_allowed", 0),
+            "rejected": counters.get("rate_rejected", 0),
+            "evicted": counters.get("rate_evicted", 0),
+            "shared": True
+        }
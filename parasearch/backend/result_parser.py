@@ -0,0 +1,169 @@
+"""
+ParaSearch Result Parser
+Incremental state-machine parser for the RESULT/TITLE/SNIPPET/RELEVANCE/EXPANDED format
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+# Per-line patterns. Each complete line is matched once, never rescanned.
+_FIELD_LINE = re.compile(r"^(TITLE|SNIPPET|RELEVANCE|EXPANDED)\s*:\s*(.*)$", re.IGNORECASE)
+_RESULT_LINE = re.compile(r"^RESULT\s*#?\s*\d+\b", re.IGNORECASE)
+_DELIMITER_LINE = re.compile(r"^-{3,}$")
+_RELEVANCE_VALUE = re.compile(r"\d+")
+
+# Tolerant variants skip the markdown decoration models like to add:
+# "**TITLE:** ...", "## RESULT 1", "- SNIPPET: ...", "***"
+_TOLERANT_FIELD_LINE = re.compile(
+    r"^[*#>_\-\s]*(TITLE|SNIPPET|RELEVANCE|EXPANDED)[*_\s]*:[*_\s]*(.*?)[*_\s]*$", re.IGNORECASE
+)
+_TOLERANT_RESULT_LINE = re.compile(r"^[*#>_\-\s]*RESULT\s*#?\s*\d+\b", re.IGNORECASE)
+_TOLERANT_DELIMITER_LINE = re.compile(r"^[-_*=]{3,}$")
+
+
+class ParsedBlock(NamedTuple):
+    title: str
+    snippet: str
+    relevance: int
+    expanded: Optional[str]
+
+
+class ResultStreamParser:
+    """
+    Feeds model output in arbitrary chunks and emits each result block as
+    soon as it is complete, without rescanning earlier text.
+
+    A block ends at a "---" line, at the next "RESULT n" header, or at
+    close(). Blank lines inside a block are kept as part of the current
+    field, so a blank line no longer cuts a result in half. Snippet and
+    expanded text may span several lines and are whitespace-normalized.
+
+    In tolerant mode, markdown decoration around labels is ignored. A
+    TITLE that appears while the current block already has one starts a
+    new block, which recovers results whose delimiter the model left out.
+    Blocks missing a title, snippet or relevance are counted as failures.
+    """
+
+    def __init__(self, tolerant: bool = True):
+        self.tolerant = tolerant
+        if tolerant:
+            self._field_line = _TOLERANT_FIELD_LINE
+            self._result_line = _TOLERANT_RESULT_LINE
+            self._delimiter_line = _TOLERANT_DELIMITER_LINE
+        else:
+            self._field_line = _FIELD_LINE
+            self._result_line = _RESULT_LINE
+            self._delimiter_line = _DELIMITER_LINE
+        self._partial = ""
+        self._fields: Dict[str, List[str]] = {}
+        self._current: Optional[str] = None
+        self.parsed = 0
+        self.failed = 0
+        self.recovered = 0
+
+    def feed(self, chunk: str) -> List[ParsedBlock]:
+        """Consume a chunk of output; return the blocks it completed"""
+        completed: List[ParsedBlock] = []
+        text = self._partial + chunk
+        start = 0
+        newline = text.find("\n", start)
+        while newline != -1:
+            self._line(text[start:newline], completed)
+            start = newline + 1
+            newline = text.find("\n", start)
+        self._partial = text[start:]
+        return completed
+
+    def close(self) -> List[ParsedBlock]:
+        """Flush the final line and block at the end of the output"""
+        completed: List[ParsedBlock] = []
+        if self._partial:
+            self._line(self._partial, completed)
+            self._partial = ""
+        self._end_block(completed)
+        return completed
+
+    def _line(self, line: str, completed: List[ParsedBlock]):
+        line = line.strip()
+        if self._delimiter_line.match(line) or self._result_line.match(line):
+            self._end_block(completed)
+            return
+
+        match = self._field_line.match(line)
+        if match:
+            field, value = match.group(1).lower(), match.group(2)
+            if field in self._fields:
+                if not (self.tolerant and field == "title"):
+                    # Repeated label: treat as a continuation of this block
+                    self._append(field, value)
+                    return
+                # A second TITLE means the previous result lost its delimiter
+                self._end_block(completed)
+                self.recovered += 1
+            self._fields[field] = []
+            self._current = field
+            self._append(field, value)
+            return
+
+        # Continuation lines extend multi-line snippet and expanded fields
+        if self._current in ("snippet", "expanded"):
+            self._append(self._current, line)
+
+    def _append(self, field: str, value: str):
+        if value:
+            self._fields[field].append(value)
+
+    def _end_block(self, completed: List[ParsedBlock]):
+        fields, self._fields, self._current = self._fields, {}, None
+        if not fields:
+            return
+
+        title = " ".join(fields.get("title", []))
+        snippet = " ".join(" ".join(fields.get("snippet", [])).split())
+        relevance = _RELEVANCE_VALUE.search(" ".join(fields.get("relevance", [])))
+        if not (title and snippet and relevance):
+            self.failed += 1
+            return
+
+        expanded = " ".join(" ".join(fields.get("expanded", [])).split()) or None
+        self.parsed += 1
+        completed.append(ParsedBlock(title, snippet, int(relevance.group()), expanded))
+
+    def stats(self) -> Dict:
+        return {"parsed": self.parsed, "failed": self.failed, "recovered": self.recovered}
+
+
+class ParseStats:
+    """Running parse totals per model and output mode ("text", "structured", "fallback"), for /stats"""
+
+    FIELDS = ("outputs", "expected", "parsed", "usable", "failed", "recovered", "empty_outputs", "complete_outputs")
+
+    def __init__(self):
+        self._totals: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    def add(self, model: str, mode: str, expected: int, parsed: int, failed: int = 0, recovered: int = 0):
+        """Record one model output that was expected to hold `expected` results"""
+        totals = self._totals.setdefault(model, {}).setdefault(mode, dict.fromkeys(self.FIELDS, 0))
+        totals["outputs"] += 1
+        totals["expected"] += expected
+        totals["parsed"] += parsed
+        totals["usable"] += min(parsed, expected)
+        totals["failed"] += failed
+        totals["recovered"] += recovered
+        if not parsed:
+            totals["empty_outputs"] += 1
+        if parsed >= expected:
+            totals["complete_outputs"] += 1
+
+    def stats(self) -> Dict:
+        return {
+            model: {
+                mode: {
+                    **totals,
+                    # Share of outputs that produced every requested result
+                    "success_rate": round(totals["complete_outputs"] / totals["outputs"], 3),
+                    "result_yield": round(totals["usable"] / totals["expected"], 3) if totals["expected"] else 0.0
+                }
+                for mode, totals in modes.items()
+            }
+            for model, modes in self._totals.items()
+        }
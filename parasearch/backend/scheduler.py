@@ -0,0 +1,239 @@
+"""
+ParaSearch Admission Control
+Per-model concurrency limits with a bounded, time-limited wait queue
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """The generation queue is full or the wait took too long"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ModelQueue:
+    """Slots and FIFO waiters for one model"""
+
+    # Generation time assumed before any generation has been observed
+    INITIAL_GENERATION_TIME = 10.0
+    # Weight of the newest sample in the moving averages
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, per_backend: int):
+        self.per_backend = per_backend
+        self.limit = per_backend  # per_backend times the backends serving the model
+        self.active = 0
+        self.waiters: deque = deque()
+        self.background_active = 0
+        self.background_waiters: deque = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.overflowed = 0
+        self.avg_generation_time = self.INITIAL_GENERATION_TIME
+        self.avg_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def observe_generation(self, duration: float):
+        self.avg_generation_time += self.EWMA_ALPHA * (duration - self.avg_generation_time)
+
+    def observe_wait(self, wait: float):
+        self.avg_wait_time += self.EWMA_ALPHA * (wait - self.avg_wait_time)
+        self.max_wait_time = max(self.max_wait_time, wait)
+
+    def background_free(self) -> bool:
+        """
+        Whether a background request may start: nothing in the foreground
+        queue, a free slot, and at least one slot left for foreground work
+        (unless the model only has one).
+        """
+        return (not self.waiters and self.active < self.limit
+                and self.background_active < max(1, self.limit - 1))
+
+    def retry_after(self) -> int:
+        """Estimate when a slot frees up, from queue depth and observed generation time"""
+        rounds = (len(self.waiters) + 1) / self.limit
+        return max(1, math.ceil(rounds * self.avg_generation_time))
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "per_backend": self.per_backend,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "background_active": self.background_active,
+            "background_queued": len(self.background_waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "overflowed": self.overflowed,
+            "avg_wait_time": round(self.avg_wait_time, 3),
+            "max_wait_time": round(self.max_wait_time, 3),
+            "avg_generation_time": round(self.avg_generation_time, 3)
+        }
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of Ollama generations.
+
+    Each model gets a number of concurrent generation slots per backend
+    serving it, so adding backends adds capacity; backends(model) reports
+    how many currently do (at least one is assumed). Extra requests wait
+    in a bounded FIFO queue for at most max_wait seconds. When the queue
+    is full, requests are rejected at once with a Retry-After estimate,
+    so they fail fast instead of timing out later inside Ollama.
+
+    Background requests (batch jobs) have their own unbounded queue with
+    no wait limit. They are only admitted when no foreground request is
+    waiting, and never hold the model's last free slot, so offline work
+    cannot starve interactive searches.
+
+    Slots are counted in this process only: with several workers each
+    one admits up to the limit.
+    """
+
+    def __init__(self, default_limit: int, max_queue: int, max_wait: float,
+                 limits: Optional[Dict[str, int]] = None,
+                 backends: Optional[Callable[[str], int]] = None):
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.limits = limits or {}
+        self.backends = backends
+        self._queues: Dict[str, ModelQueue] = {}
+
+    def queue(self, model: str) -> ModelQueue:
+        q = self._queues.get(model)
+        if q is None:
+            q = ModelQueue(max(1, self.limits.get(model, self.default_limit)))
+            self._queues[model] = q
+        serving = self.backends(model) if self.backends else 1
+        q.limit = q.per_backend * max(1, serving)
+        return q
+
+    def check(self, model: str):
+        """Raise AdmissionRejected if a new request for model would be rejected right now"""
+        q = self.queue(model)
+        if q.active >= q.limit and len(q.waiters) >= self.max_queue:
+            raise AdmissionRejected("Search queue is full, please retry shortly", q.retry_after())
+
+    async def acquire(self, model: str, wait: bool = True, overflow: bool = False,
+                      background: bool = False):
+        """
+        Take a slot for model; with wait=False, only if one is free right
+        now. With overflow=True the slot is granted at once even past the
+        limit, for work budgeted elsewhere (hedges); it still counts as
+        active, so queued requests wait for it like any other. With
+        background=True the request waits behind all foreground work.
+        """
+        q = self.queue(model)
+        if background and not overflow:
+            await self._acquire_background(model, q)
+            return
+        if overflow or (q.active < q.limit and not q.waiters):
+            q.active += 1
+            q.admitted += 1
+            q.overflowed += q.active > q.limit
+            q.observe_wait(0.0)
+            return
+
+        if not wait:
+            raise AdmissionRejected("No free generation slot", q.retry_after())
+        if len(q.waiters) >= self.max_queue:
+            q.rejected += 1
+            raise AdmissionRejected("Search queue is full, please retry shortly", q.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        q.waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we gave up; pass it on
+                self.release(model)
+            else:
+                waiter.cancel()
+                try:
+                    q.waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                q.timed_out += 1
+                raise AdmissionRejected("Timed out waiting in the search queue", q.retry_after()) from None
+            raise
+        q.admitted += 1
+        q.observe_wait(time.monotonic() - started)
+
+    async def _acquire_background(self, model: str, q: ModelQueue):
+        if not q.background_waiters and q.background_free():
+            q.active += 1
+            q.background_active += 1
+            q.admitted += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        q.background_waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release(model, background=True)
+            else:
+                waiter.cancel()
+                try:
+                    q.background_waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+        q.admitted += 1
+
+    def release(self, model: str, duration: Optional[float] = None, background: bool = False):
+        """Free a slot and hand free slots straight to the next live waiters"""
+        q = self.queue(model)
+        if duration is not None:
+            q.observe_generation(duration)
+        q.active -= 1
+        if background:
+            q.background_active -= 1
+        # More than one slot may be free if a backend has joined since
+        while q.waiters and q.active < q.limit:
+            waiter = q.waiters.popleft()
+            if not waiter.done():
+                q.active += 1
+                waiter.set_result(None)
+        while q.background_waiters and q.background_free():
+            waiter = q.background_waiters.popleft()
+            if not waiter.done():
+                q.active += 1
+                q.background_active += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, model: str, wait: bool = True, overflow: bool = False,
+                   background: bool = False) -> AsyncIterator[None]:
+        """Hold one generation slot for model for the duration of the block"""
+        await self.acquire(model, wait, overflow, background)
+        background = background and not overflow
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.release(model, background=background)
+            raise
+        self.release(model, time.monotonic() - started, background)
+
+    def stats(self) -> Dict:
+        return {
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "models": {model: q.stats() for model, q in self._queues.items()}
+        }
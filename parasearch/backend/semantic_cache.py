@@ -0,0 +1,329 @@
+"""
+ParaSearch Semantic Cache
+Serves cached results for queries that mean the same thing as an earlier one.
+
+Queries are embedded (by Ollama, in main.py) and looked up in an
+in-process vector index. Entries are scoped by embedding model and
+generation settings, so a hit always comes from the same model, result
+count and temperature. The index is a NumPy matrix searched by brute
+force, or optionally an IVF index (k-means clusters, probing the closest
+few) once it holds many entries.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from shared_state import connect_sqlite, write_behind
+
+
+class SQLiteSemanticStore:
+    """On-disk copy of the semantic cache, reloaded at startup"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            " key TEXT PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, limit: int) -> List[tuple]:
+        """Unexpired (key, scope, query, vector, value, expires_at) rows, newest first"""
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+            return self._conn.execute(
+                "SELECT key, scope, query, vector, value, expires_at FROM semantic_cache"
+                " ORDER BY expires_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def set(self, key: str, scope: str, query: str, vector: bytes, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO semantic_cache (key, scope, query, vector, value, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, scope, query, vector, value, expires_at)
+            )
+            self._conn.commit()
+
+    def delete(self, keys: List[str]):
+        if not keys:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM semantic_cache WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM semantic_cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def spherical_kmeans(vectors: np.ndarray, iterations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Centroids for about sqrt(n) clusters of unit vectors, and the cluster of every vector"""
+    k = max(1, int(np.sqrt(len(vectors))))
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Keep the old centroid for a cluster that lost all its members
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+    centroids = centroids.astype(np.float32)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+class SemanticCache:
+    """
+    Fixed-capacity vector index of cached searches.
+
+    Vectors are L2-normalized rows of a preallocated matrix, so cosine
+    similarity is one matrix-vector product. When full, expired entries
+    go first, then the least recently used. With index="ivf" and at least
+    ivf_min_entries entries, lookups only scan the ivf_probes clusters
+    whose centroids are closest to the query; clusters are rebuilt once
+    the index has changed by a quarter since the last build.
+
+    Inside an event loop the k-means runs on a worker thread over a
+    snapshot of the vectors, and lookups scan the flat index until it
+    finishes. Rows changed meanwhile are reassigned when the new
+    clusters are installed.
+    """
+
+    # k-means iterations when (re)building IVF clusters
+    KMEANS_ITERATIONS = 8
+
+    def __init__(self, threshold: float, max_entries: int, ttl: float,
+                 index: str = "flat", ivf_min_entries: int = 5000, ivf_probes: int = 4,
+                 store: Optional[SQLiteSemanticStore] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.index = index
+        self.ivf_min_entries = ivf_min_entries
+        self.ivf_probes = ivf_probes
+        self.store = store
+
+        self._vectors: Optional[np.ndarray] = None       # (max_entries, dim) float32, allocated on first add
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._scopes = np.full(max_entries, -1, dtype=np.int32)
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._queries: List[Optional[str]] = [None] * max_entries
+        self._values: List[Optional[str]] = [None] * max_entries
+        self._slots: Dict[str, int] = {}                  # key -> row
+        self._scope_ids: Dict[str, int] = {}
+
+        # IVF state: centroids, the cluster of every row and each cluster's rows
+        # (member lists may hold stale rows; lookups check _clusters)
+        self._centroids: Optional[np.ndarray] = None
+        self._clusters = np.full(max_entries, -1, dtype=np.int32)
+        self._members: List[List[int]] = []
+        self._changes_since_build = 0
+        self._rebuild: Optional[asyncio.Future] = None  # background k-means in progress
+        self._dirty: Set[int] = set()                  # rows changed since its snapshot
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if store is not None:
+            for key, scope, query, vector, value, expires_at in store.load(max_entries):
+                self._add(key, scope, query, np.frombuffer(vector, dtype=np.float32), value, expires_at)
+
+    def _scope_id(self, scope: str) -> int:
+        return self._scope_ids.setdefault(scope, len(self._scope_ids))
+
+    def _free_row(self) -> int:
+        """A free row, evicting expired entries or else the least recently used one"""
+        if len(self._slots) < self.max_entries:
+            return int(np.flatnonzero(~self._valid)[0])
+        expired = np.flatnonzero(self._valid & (self._expires < time.time()))
+        if len(expired):
+            victims = expired
+        else:
+            victims = [int(np.argmin(np.where(self._valid, self._last_used, np.inf)))]
+            self.evictions += 1
+        keys = [self._keys[row] for row in victims]
+        for row in victims:
+            self._remove(int(row))
+        if self.store is not None:
+            write_behind(self.store.delete, keys)
+        return int(victims[0])
+
+    def _remove(self, row: int):
+        del self._slots[self._keys[row]]
+        self._valid[row] = False
+        self._keys[row] = self._queries[row] = self._values[row] = None
+        self._clusters[row] = -1
+        self._changes_since_build += 1
+        if self._rebuild is not None:
+            self._dirty.add(row)
+
+    def _add(self, key: str, scope: str, query: str, vector: np.ndarray, value: str, expires_at: float) -> bool:
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return False
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        elif len(vector) != self._vectors.shape[1]:
+            return False  # embedding from a different model
+
+        row = self._slots.get(key)
+        if row is None:
+            row = self._free_row()
+        self._vectors[row] = vector / norm
+        self._valid[row] = True
+        self._scopes[row] = self._scope_id(scope)
+        self._expires[row] = expires_at
+        self._last_used[row] = time.time()
+        self._keys[row], self._queries[row], self._values[row] = key, query, value
+        self._slots[key] = row
+        self._changes_since_build += 1
+        if self._rebuild is not None:
+            self._dirty.add(row)
+        if self._centroids is not None:
+            cluster = int(np.argmax(self._centroids @ self._vectors[row]))
+            self._clusters[row] = cluster
+            self._members[cluster].append(row)
+        return True
+
+    def _build_clusters(self):
+        """
+        Re-cluster the current entries: on a worker thread when called
+        from an event loop, otherwise right away
+        """
+        rows = np.flatnonzero(self._valid)
+        vectors = self._vectors[rows]
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._install_clusters(rows, *spherical_kmeans(vectors, self.KMEANS_ITERATIONS))
+            return
+        self._dirty = set()
+        self._rebuild = loop.run_in_executor(None, spherical_kmeans, vectors, self.KMEANS_ITERATIONS)
+        self._rebuild.add_done_callback(lambda future: self._finish_rebuild(future, rows))
+
+    def _finish_rebuild(self, future: asyncio.Future, rows: np.ndarray):
+        self._rebuild = None
+        if future.cancelled() or future.exception() is not None:
+            self._dirty = set()
+            return
+        self._install_clusters(rows, *future.result())
+
+    def _install_clusters(self, rows: np.ndarray, centroids: np.ndarray, assignment: np.ndarray):
+        """Switch to new clusters built from rows, reassigning rows changed since"""
+        self._centroids = centroids
+        self._clusters[:] = -1
+        self._clusters[rows] = assignment
+        if self._dirty:
+            dirty = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+            self._clusters[dirty] = -1
+            live = dirty[self._valid[dirty]]
+            if len(live):
+                self._clusters[live] = np.argmax(self._vectors[live] @ centroids.T, axis=1)
+        self._members = [[] for _ in range(len(centroids))]
+        live = np.flatnonzero(self._clusters >= 0)
+        for row, cluster in zip(live.tolist(), self._clusters[live].tolist()):
+            self._members[cluster].append(row)
+        self._changes_since_build = len(self._dirty)
+        self._dirty = set()
+
+    def _use_ivf(self) -> bool:
+        return self.index == "ivf" and len(self._slots) >= self.ivf_min_entries
+
+    def _best_flat(self, query: np.ndarray, scope_id: int) -> Tuple[int, float]:
+        """Score every row with one matrix-vector product, masking rows out of scope"""
+        similarities = self._vectors @ query
+        live = self._valid & (self._scopes == scope_id) & (self._expires >= time.time())
+        similarities[~live] = -np.inf
+        row = int(np.argmax(similarities))
+        return row, float(similarities[row])
+
+    def _best_ivf(self, query: np.ndarray, scope_id: int) -> Tuple[int, float]:
+        """Score only the rows in the ivf_probes clusters closest to the query"""
+        if self._rebuild is None and (self._centroids is None
+                                      or self._changes_since_build > len(self._slots) // 4):
+            self._build_clusters()
+        if self._rebuild is not None:
+            return self._best_flat(query, scope_id)
+        probes = np.argsort(self._centroids @ query)[-self.ivf_probes:]
+        rows = np.unique(np.concatenate([np.asarray(self._members[c], dtype=np.int64) for c in probes]))
+        rows = rows[self._valid[rows] & np.isin(self._clusters[rows], probes)
+                    & (self._scopes[rows] == scope_id) & (self._expires[rows] >= time.time())]
+        if not len(rows):
+            return -1, -np.inf
+        similarities = self._vectors[rows] @ query
+        best = int(np.argmax(similarities))
+        return int(rows[best]), float(similarities[best])
+
+    def get(self, scope: str, vector: List[float]) -> Optional[Tuple[List[Dict], str, float]]:
+        """(results, matched query, similarity) of the closest entry above the threshold"""
+        scope_id = self._scope_ids.get(scope)
+        query = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if (scope_id is None or self._vectors is None or norm == 0.0
+                or len(query) != self._vectors.shape[1]):
+            self.misses += 1
+            return None
+
+        query /= norm
+        row, similarity = self._best_ivf(query, scope_id) if self._use_ivf() else self._best_flat(query, scope_id)
+        if similarity >= self.threshold:
+            self._last_used[row] = time.time()
+            self.hits += 1
+            return json.loads(self._values[row]), self._queries[row], similarity
+        self.misses += 1
+        return None
+
+    def set(self, key: str, scope: str, query: str, vector: List[float], results: List[Dict]):
+        value = json.dumps(results)
+        expires_at = time.time() + self.ttl
+        array = np.asarray(vector, dtype=np.float32)
+        if self._add(key, scope, query, array, value, expires_at) and self.store is not None:
+            write_behind(self.store.set, key, scope, query, array.tobytes(), value, expires_at)
+
+    def clear(self):
+        for row in list(self._slots.values()):
+            self._remove(row)
+        self._centroids = None
+        if self.store is not None:
+            self.store.clear()
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._slots),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "index": "ivf" if self._use_ivf() else "flat",
+            "clusters": 0 if self._centroids is None else len(self._centroids),
+            "rebuilding": self._rebuild is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": self.store is not None
+        }
@@ -0,0 +1,199 @@
+"""
+ParaSearch Shared State
+Cross-process state for running several uvicorn workers on one host.
+
+SQLiteSharedState keeps rate-limit buckets, counters and "more results"
+cursors in a SQLite database in WAL mode, so every worker process sees
+the same limits and can continue any worker's search without an
+external service. Each operation is a single short
+transaction; BEGIN IMMEDIATE serializes writers across processes.
+
+A writer may wait up to busy_timeout for another worker's lock, so calls
+made from the event loop go through run_sqlite() or write_behind(), which
+run them on a dedicated thread.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+# One thread for every SQLite call made from the event loop. A single
+# thread keeps writes in submission order, so awaiting a call also
+# waits for every write queued before it.
+_sqlite_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parasearch-sqlite")
+
+logger = logging.getLogger(__name__)
+
+# Failed write_behind() calls by function name, reported in /stats and /metrics
+write_failures: Dict[str, int] = defaultdict(int)
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open a SQLite connection tuned for concurrent access from several processes"""
+    conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+async def run_sqlite(fn: Callable[..., Any], *args) -> Any:
+    """Run a blocking SQLite call on the SQLite thread and wait for its result"""
+    return await asyncio.get_running_loop().run_in_executor(_sqlite_executor, fn, *args)
+
+
+def write_behind(fn: Callable[..., Any], *args):
+    """
+    Queue a SQLite write on the SQLite thread without waiting for it.
+    Outside an event loop (startup, scripts) the write runs inline.
+    A failed queued write is logged and counted in write_failures.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        fn(*args)
+        return
+    _sqlite_executor.submit(fn, *args).add_done_callback(
+        lambda future: _check_write(fn, future)
+    )
+
+
+def _check_write(fn: Callable[..., Any], future: Future):
+    error = future.exception()
+    if error is not None:
+        name = getattr(fn, "__qualname__", repr(fn))
+        write_failures[name] += 1
+        logger.warning("SQLite write %s failed: %s", name, error)
+
+
+class SQLiteSharedState:
+    """Rate-limit buckets, counters and search cursors shared by all workers on a host"""
+
+    # Run housekeeping (idle bucket and old counter cleanup) every N writes
+    PURGE_EVERY = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._writes = 0
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, last_seen REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS rate_buckets_last_seen ON rate_buckets (last_seen);"
+            "CREATE TABLE IF NOT EXISTS request_seconds ("
+            " second INTEGER PRIMARY KEY, count INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " name TEXT PRIMARY KEY, value INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS cursors ("
+            " id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS cursors_expires_at ON cursors (expires_at);"
+        )
+        self._cursor_writes = 0
+
+    def take_token(self, key: str, capacity: float, refill_rate: float,
+                   window: float, max_clients: int) -> bool:
+        """Atomically refill and take one token from key's bucket"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, last_seen FROM rate_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    tokens = capacity
+                else:
+                    tokens = min(capacity, row[0] + (now - row[1]) * refill_rate)
+
+                allowed = tokens >= 1.0
+                if allowed:
+                    tokens -= 1.0
+                    self._conn.execute(
+                        "INSERT INTO request_seconds (second, count) VALUES (?, 1)"
+                        " ON CONFLICT(second) DO UPDATE SET count = count + 1",
+                        (int(now),)
+                    )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (key, tokens, last_seen) VALUES (?, ?, ?)",
+                    (key, tokens, now)
+                )
+                self._incr("rate_allowed" if allowed else "rate_rejected", 1)
+
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    self._purge(now, window, max_clients)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed
+
+    def _purge(self, now: float, window: float, max_clients: int):
+        self._conn.execute("DELETE FROM rate_buckets WHERE last_seen < ?", (now - window,))
+        self._conn.execute("DELETE FROM request_seconds WHERE second < ?", (int(now - window),))
+        cursor = self._conn.execute(
+            "DELETE FROM rate_buckets WHERE key IN ("
+            " SELECT key FROM rate_buckets ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+            (max_clients,)
+        )
+        self._incr("rate_evicted", cursor.rowcount)
+
+    def _incr(self, name: str, amount: int):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self._incr(name, amount)
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+
+    def rate_stats(self, window: float) -> Dict:
+        since = time.time() - window
+        with self._lock:
+            requests = self._conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM request_seconds WHERE second > ?", (int(since),)
+            ).fetchone()[0]
+            clients = self._conn.execute(
+                "SELECT COUNT(*) FROM rate_buckets WHERE last_seen > ?", (since,)
+            ).fetchone()[0]
+        return {"requests_in_window": requests, "active_clients": clients}
+
+    def set_cursor(self, cursor_id: str, data: Dict, ttl: float, max_entries: int):
+        """Store a cursor's JSON-serializable fields until ttl seconds from now"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (id, data, expires_at) VALUES (?, ?, ?)",
+                (cursor_id, json.dumps(data), now + ttl)
+            )
+            self._cursor_writes += 1
+            if self._cursor_writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cursors WHERE expires_at < ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM cursors WHERE id IN ("
+                    " SELECT id FROM cursors ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (max_entries,)
+                )
+
+    def get_cursor(self, cursor_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM cursors WHERE id = ? AND expires_at >= ?", (cursor_id, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,98 @@
+"""
+ParaSearch Signal Matching
+Precompiled word-boundary matchers for hallucination and query-risk heuristics
+"""
+import re
+from typing import Iterable, List, NamedTuple
+
+# Hallucination indicators in generated text
+HEDGE_WORDS = [
+    "i think", "probably", "might", "could be", "possibly",
+    "i'm not sure", "uncertain", "may", "perhaps", "likely"
+]
+
+CONFLICTING_PHRASES = [
+    "on the other hand", "however it's also", "but there's debate",
+    "sources differ", "unclear", "disputed"
+]
+
+# Query risk signals, in warning priority order
+QUERY_RISK_SIGNALS = {
+    'recent_events': ['today', 'now', 'current', 'latest', 'recent', '2025', '2026', 'this year'],
+    'real_time_data': ['weather', 'stock', 'price', 'news', 'score', 'election results'],
+    'specialized': ['theorem', 'equation', 'proof', 'diagnosis', 'legal', 'medical advice'],
+    'personal': ['my', 'i', 'me', 'personal', 'private']
+}
+
+
+def _alternation(phrases: Iterable[str]) -> str:
+    # Longest first so multi-word phrases win over their prefixes
+    return "|".join(re.escape(p) for p in sorted(phrases, key=len, reverse=True))
+
+
+class TextSignals(NamedTuple):
+    hedge_count: int
+    conflict_count: int
+    has_specific_numbers: bool
+
+
+# Generated text is scanned with str.find per phrase plus a word-boundary
+# check. In CPython this beats one big alternation regex by roughly 10x on
+# long texts: find() runs in C, while the regex engine tries every
+# alternative at every character. Short queries use a single alternation.
+_HEDGE_PHRASES = tuple(HEDGE_WORDS)
+_CONFLICT_PHRASES = tuple(CONFLICTING_PHRASES)
+_NUMBER_PATTERN = re.compile(r"\b\d{4}\b|\b\d+%|\$\d+")
+
+_QUERY_PATTERN = re.compile("|".join(
+    rf"\b(?P<{risk_type}>{_alternation(keywords)})\b"
+    for risk_type, keywords in QUERY_RISK_SIGNALS.items()
+))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def contains_phrase(text: str, phrase: str) -> bool:
+    """Whether phrase occurs in text as whole words ("may" does not match "mayor")"""
+    end_of_text = len(text)
+    start = text.find(phrase)
+    while start != -1:
+        end = start + len(phrase)
+        if ((start == 0 or not _is_word_char(text[start - 1]))
+                and (end == end_of_text or not _is_word_char(text[end]))):
+            return True
+        start = text.find(phrase, start + 1)
+    return False
+
+
+def scan_text(text: str) -> TextSignals:
+    """
+    Count distinct hedge words and conflicting phrases and detect specific
+    numbers. Lowercases the text once; meant to be called once per result.
+    """
+    text_lower = text.lower()
+    return TextSignals(
+        hedge_count=sum(1 for phrase in _HEDGE_PHRASES if contains_phrase(text_lower, phrase)),
+        conflict_count=sum(1 for phrase in _CONFLICT_PHRASES if contains_phrase(text_lower, phrase)),
+        has_specific_numbers=bool(_NUMBER_PATTERN.search(text))
+    )
+
+
+def risk_from_signals(signals: TextSignals) -> str:
+    """Map text signals to a "low"/"medium"/"high" hallucination risk"""
+    total_indicators = signals.hedge_count + signals.conflict_count
+
+    if total_indicators >= 3 or signals.conflict_count >= 2:
+        return "high"
+    elif total_indicators >= 1 or (signals.has_specific_numbers and signals.hedge_count >= 1):
+        return "medium"
+    else:
+        return "low"
+
+
+def scan_query(query: str) -> List[str]:
+    """Risk types whose keywords appear in the query, in priority order"""
+    found = {match.lastgroup for match in _QUERY_PATTERN.finditer(query.lower())}
+    return [risk_type for risk_type in QUERY_RISK_SIGNALS if risk_type in found]
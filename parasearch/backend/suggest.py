@@ -0,0 +1,269 @@
+"""
+ParaSearch Query Suggestions
+Autocomplete for the search box, answered from memory without the model.
+
+Every served search is counted in a prefix index keyed by its normalized
+query, so a user who picks a suggestion sends a query the result cache
+has most likely seen. Counts are also written to a SQLite query log,
+from which the index is rebuilt at startup.
+
+Suggestions show queries to other users, so a query is only suggested
+once min_count distinct clients have searched it. Clients are recorded
+as truncated hashes, and only until a query reaches min_count.
+"""
+import hashlib
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from cache import normalize_query
+from shared_state import connect_sqlite, write_behind
+
+
+class SQLiteQueryLog:
+    """Served queries and how often each was searched, one row per normalized query"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_log ("
+            " query TEXT PRIMARY KEY,"
+            " display TEXT NOT NULL,"
+            " count INTEGER NOT NULL,"
+            " last_served REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_clients ("
+            " query TEXT NOT NULL,"
+            " client TEXT NOT NULL,"
+            " PRIMARY KEY (query, client))"
+        )
+        self._conn.commit()
+
+    def record(self, query: str, display: str, client: str, max_clients: int):
+        """Count a search, and its client until the query has max_clients of them"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO query_log (query, display, count, last_served) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT(query) DO UPDATE SET count = count + 1, last_served = excluded.last_served",
+                (query, display, time.time())
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO query_clients (query, client)"
+                " SELECT ?, ? WHERE (SELECT COUNT(*) FROM query_clients WHERE query = ?) < ?",
+                (query, client, query, max_clients)
+            )
+            self._conn.commit()
+
+    def load(self, limit: int) -> List[tuple]:
+        """(query, display, count) rows, most searched first"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT query, display, count FROM query_log"
+                " ORDER BY count DESC, last_served DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def load_clients(self) -> List[tuple]:
+        """(query, client) rows"""
+        with self._lock:
+            return self._conn.execute("SELECT query, client FROM query_clients").fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_log")
+            self._conn.execute("DELETE FROM query_clients")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Node:
+    __slots__ = ("label", "children", "top", "terminal")
+
+    def __init__(self, label: str):
+        self.label = label                      # edge text from the parent
+        self.children: Dict[str, "_Node"] = {}  # first character of the child's label -> child
+        self.top: List[str] = []                # most searched queries below this node, best first
+        self.terminal = False                   # a query ends here
+
+
+class SuggestionIndex:
+    """
+    Path-compressed trie over normalized queries. Every node keeps its
+    top_k most searched completions, so a lookup is one walk down the
+    prefix with no scan of the subtree, and a query of n distinct
+    characters past its neighbours costs one node rather than n.
+
+    Counts only grow, so recording a search just re-ranks the nodes on
+    the query's own path. Queries searched by fewer than min_count
+    distinct clients are never suggested. Beyond max_entries queries, each new one evicts
+    one of the least searched, picked in batches of a tenth of the index.
+    """
+
+    def __init__(self, max_entries: int, top_k: int = 8, min_count: int = 3,
+                 store: Optional[SQLiteQueryLog] = None):
+        self.max_entries = max_entries
+        self.top_k = top_k
+        self.min_count = min_count
+        self.store = store
+        self._counts: Dict[str, int] = {}
+        self._display: Dict[str, str] = {}
+        self._clients: Dict[str, Set[str]] = {}  # client hashes per query, up to min_count of them
+        self._root = _Node("")
+        self._victims: List[Tuple[int, str]] = []  # (count when picked, query), least searched last
+        self.lookups = 0
+        self.evictions = 0
+        self.rebuild()
+
+    def _rank(self, query: str) -> Tuple[int, str]:
+        return -self._counts[query], query
+
+    def _promote(self, node: _Node, query: str):
+        top = node.top
+        if query not in top:
+            if len(top) >= self.top_k and self._rank(query) >= self._rank(top[-1]):
+                return
+            top.append(query)
+        top.sort(key=self._rank)
+        del top[self.top_k:]
+
+    def _suggestable(self, query: str) -> bool:
+        return len(self._clients.get(query, ())) >= self.min_count
+
+    def _index(self, query: str):
+        """Add query to the trie, or re-rank it after its count went up"""
+        suggestable = self._suggestable(query)
+        node, i = self._root, 0
+        while True:
+            if suggestable:
+                self._promote(node, query)
+            if i == len(query):
+                node.terminal = True
+                return
+            child = node.children.get(query[i])
+            if child is None:
+                child = node.children[query[i]] = _Node(query[i:])
+            else:
+                label = child.label
+                common = 0
+                while common < len(label) and i + common < len(query) and label[common] == query[i + common]:
+                    common += 1
+                if common < len(label):
+                    # Split the edge; the new node covers the same queries as child did
+                    middle = node.children[query[i]] = _Node(label[:common])
+                    middle.top = list(child.top)
+                    child.label = label[common:]
+                    middle.children[child.label[0]] = child
+                    child = middle
+            i += len(child.label)
+            node = child
+
+    def _unindex(self, query: str):
+        """Remove query from the trie, refilling the top lists it was in"""
+        path = [(self._root, "")]
+        node, i = self._root, 0
+        while i < len(query):
+            node = node.children[query[i]]
+            i += len(node.label)
+            path.append((node, query[:i]))
+        node.terminal = False
+
+        for depth in range(len(path) - 1, -1, -1):
+            node, prefix = path[depth]
+            if not node.children and not node.terminal and depth:
+                del path[depth - 1][0].children[node.label[0]]
+                continue
+            # A node whose top didn't include the query is unaffected, and so are its ancestors
+            if query not in node.top:
+                break
+            candidates = [prefix] if node.terminal and self._suggestable(prefix) else []
+            for child in node.children.values():
+                candidates.extend(child.top)
+            node.top = sorted(candidates, key=self._rank)[:self.top_k]
+
+    def _evict(self):
+        """Drop one of the least searched queries"""
+        while True:
+            if not self._victims:
+                self._victims = heapq.nsmallest(
+                    max(1, self.max_entries // 10), ((count, query) for query, count in self._counts.items())
+                )[::-1]
+            count, query = self._victims.pop()
+            # Skip queries removed since, or searched again since they were picked
+            if self._counts.get(query) == count:
+                break
+        self._unindex(query)
+        del self._counts[query]
+        del self._display[query]
+        self._clients.pop(query, None)
+        self.evictions += 1
+
+    def rebuild(self):
+        """Reload counts from the query log (if any) and rebuild the trie"""
+        if self.store is not None:
+            rows = self.store.load(self.max_entries)
+            self._counts = {query: count for query, _, count in rows}
+            self._display = {query: display for query, display, _ in rows}
+            self._clients = {}
+            for query, client in self.store.load_clients():
+                if query in self._counts:
+                    self._clients.setdefault(query, set()).add(client)
+        self._root = _Node("")
+        self._victims = []
+        for query in self._counts:
+            self._index(query)
+
+    def record(self, query: str, client: str):
+        """Count one served search for query by client (e.g. its IP address)"""
+        display = " ".join(query.split())
+        key = normalize_query(display)
+        if not key:
+            return
+        if key not in self._counts and len(self._counts) >= self.max_entries:
+            self._evict()
+        self._counts[key] = self._counts.get(key, 0) + 1
+        self._display.setdefault(key, display)
+        client = hashlib.sha256(client.encode()).hexdigest()[:16]
+        clients = self._clients.setdefault(key, set())
+        if len(clients) < self.min_count:
+            clients.add(client)
+        if self.store is not None:
+            write_behind(self.store.record, key, display, client, self.min_count)
+        self._index(key)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict]:
+        """Most searched queries starting with prefix (compared normalized)"""
+        self.lookups += 1
+        key = normalize_query(prefix)
+        # Keep a trailing space so "rome " only completes whole words
+        if key and prefix[-1:].isspace():
+            key += " "
+        node, i = self._root, 0
+        while i < len(key):
+            node = node.children.get(key[i])
+            if node is None:
+                return []
+            rest = key[i:i + len(node.label)]
+            if not node.label.startswith(rest):
+                return []
+            i += len(node.label)
+        return [{"query": self._display[query], "count": self._counts[query]} for query in node.top[:limit]]
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def stats(self) -> Dict:
+        return {
+            "queries": len(self._counts),
+            "max_entries": self.max_entries,
+            "min_count": self.min_count,
+            "lookups": self.lookups,
+            "evictions": self.evictions,
+            "persistent": self.store is not None
+        }
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ParaSearch Result Parser Benchmark
+Compares the incremental state-machine parser with the original
+split-and-regex parser on whole outputs and on token-sized streaming
+chunks, and shows results the original parser loses. No Ollama or
+backend needed.
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from result_parser import ResultStreamParser
+
+# ---------------------------------------------------------------------------
+# Original implementation, kept here as the baseline
+# ---------------------------------------------------------------------------
+
+LEGACY_STREAM_DELIMITER = re.compile(r'-{3,}[ \t]*\n')
+
+def legacy_parse_block(block: str):
+    title_match = re.search(r'TITLE:\s*(.+?)(?:\n|$)', block, re.IGNORECASE)
+    snippet_match = re.search(r'SNIPPET:\s*(.+?)(?=\n(?:RELEVANCE|EXPANDED|$))', block, re.IGNORECASE | re.DOTALL)
+    relevance_match = re.search(r'RELEVANCE:\s*(\d+)', block, re.IGNORECASE)
+    expanded_match = re.search(r'EXPANDED:\s*(.+?)(?=\n(?:RESULT|$)|$)', block, re.IGNORECASE | re.DOTALL)
+    if not (title_match and snippet_match and relevance_match):
+        return None
+    return (
+        title_match.group(1).strip(),
+        re.sub(r'\s+', ' ', snippet_match.group(1).strip()),
+        int(relevance_match.group(1)),
+        re.sub(r'\s+', ' ', expanded_match.group(1).strip()) if expanded_match else None
+    )
+
+def legacy_parse(text: str) -> list:
+    results = []
+    for block in re.split(r'---+|\n\s*\n', text):
+        if block.strip():
+            result = legacy_parse_block(block)
+            if result:
+                results.append(result)
+    return results
+
+def legacy_stream(chunks) -> list:
+    # Buffered the whole pending text and re-searched it on every chunk
+    results, buffer = [], ""
+    for chunk in chunks:
+        buffer += chunk
+        match = LEGACY_STREAM_DELIMITER.search(buffer)
+        while match:
+            block, buffer = buffer[:match.start()], buffer[match.end():]
+            result = legacy_parse_block(block)
+            if result:
+                results.append(result)
+            match = LEGACY_STREAM_DELIMITER.search(buffer)
+    if buffer.strip():
+        result = legacy_parse_block(buffer)
+        if result:
+            results.append(result)
+    return results
+
+def new_parse(text: str) -> list:
+    parser = ResultStreamParser()
+    return parser.feed(text) + parser.close()
+
+def new_stream(chunks) -> list:
+    parser = ResultStreamParser()
+    results = []
+    for chunk in chunks:
+        results += parser.feed(chunk)
+    return results + parser.close()
+
+# ---------------------------------------------------------------------------
+# Synthetic model output
+# ---------------------------------------------------------------------------
+
+WORDS = (
+    "photosynthesis converts light energy into chemical energy stored in glucose "
+    "the empire reached its greatest extent under trajan before a slow decline "
+    "researchers measured the effect across several independent trials"
+).split()
+
+def make_output(results: int, expanded_words: int, seed: int, blank_lines: bool = False) -> str:
+    rng = random.Random(seed)
+    gap = "\n\n" if blank_lines else "\n"
+    blocks = []
+    for i in range(1, results + 1):
+        snippet = " ".join(rng.choice(WORDS) for _ in range(25))
+        expanded = " ".join(rng.choice(WORDS) for _ in range(expanded_words))
+        blocks.append(
+            f"RESULT {i}\nTITLE: Result number {i}\nSNIPPET: {snippet}{gap}"
+            f"RELEVANCE: {rng.randint(5, 10)}\nEXPANDED: {expanded}\n---\n"
+        )
+    return "".join(blocks)
+
+def chunked(text: str, size: int = 4) -> list:
+    # Ollama streams a token or two per chunk
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def bench(label: str, fn, arg, repeat: int = 3) -> float:
+    timer = timeit.Timer(lambda: fn(arg))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(number=number, repeat=repeat))
+    per_call_ms = best / number * 1e3
+    print(f"   {label:<28} {per_call_ms:10.3f} ms/output")
+    return per_call_ms
+
+def main():
+    print("⚡ ParaSearch Result Parser Benchmark")
+    print("=" * 50)
+
+    for results, expanded_words in ((5, 40), (10, 400), (20, 1000)):
+        text = make_output(results, expanded_words, seed=results)
+        chunks = chunked(text)
+        print(f"\n📄 {results} results (~{len(text)} chars, {len(chunks)} stream chunks)")
+        old = bench("legacy whole text", legacy_parse, text)
+        new = bench("state machine whole text", new_parse, text)
+        print(f"   Speedup: {old / new:.1f}x")
+        old = bench("legacy streaming", legacy_stream, chunks)
+        new = bench("state machine streaming", new_stream, chunks)
+        print(f"   Speedup: {old / new:.1f}x")
+
+    print("\n🎯 Results recovered (legacy → state machine):")
+    cases = {
+        "clean output": make_output(5, 40, seed=1),
+        "blank line inside each result": make_output(5, 40, seed=1, blank_lines=True),
+        "markdown-decorated labels": make_output(5, 40, seed=1).replace("TITLE:", "**TITLE:**")
+                                                               .replace("RELEVANCE:", "**RELEVANCE:**"),
+        "missing delimiters": make_output(5, 40, seed=1).replace("---\n", ""),
+    }
+    for label, text in cases.items():
+        print(f"   {label:<32} {len(legacy_parse(text))} → {len(new_parse(text))}")
+
+if __name__ == "__main__":
+    main()
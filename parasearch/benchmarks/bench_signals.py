@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+ParaSearch Signal Matching Benchmark
+Compares the precompiled word-boundary matchers with the original
+substring scans on short and long EXPANDED texts. No Ollama or backend
+needed.
+"""
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from signals import scan_text, scan_query, risk_from_signals
+
+# ---------------------------------------------------------------------------
+# Original implementations, kept here as the baseline
+# ---------------------------------------------------------------------------
+
+def legacy_detect_hallucination_risk(text: str) -> str:
+    hedge_words = [
+        "i think", "probably", "might", "could be", "possibly",
+        "i'm not sure", "uncertain", "may", "perhaps", "likely"
+    ]
+    conflicting_phrases = [
+        "on the other hand", "however it's also", "but there's debate",
+        "sources differ", "unclear", "disputed"
+    ]
+    text_lower = text.lower()
+    hedge_count = sum(1 for word in hedge_words if word in text_lower)
+    conflict_count = sum(1 for phrase in conflicting_phrases if phrase in text_lower)
+    has_specific_numbers = bool(re.search(r'\b\d{4}\b|\b\d+%\b|\$\d+', text))
+    total_indicators = hedge_count + conflict_count
+    if total_indicators >= 3 or conflict_count >= 2:
+        return "high"
+    elif total_indicators >= 1 or (has_specific_numbers and hedge_count >= 1):
+        return "medium"
+    else:
+        return "low"
+
+def legacy_score_result(text: str) -> str:
+    # The old parser scanned every result twice: once in calculate_confidence
+    # and once more for hallucination_risk
+    legacy_detect_hallucination_risk(text)
+    return legacy_detect_hallucination_risk(text)
+
+def legacy_query_risks(query: str) -> list:
+    query_lower = query.lower()
+    risk_signals = {
+        'recent_events': ['today', 'now', 'current', 'latest', 'recent', '2025', '2026', 'this year'],
+        'real_time_data': ['weather', 'stock', 'price', 'news', 'score', 'election results'],
+        'specialized': ['theorem', 'equation', 'proof', 'diagnosis', 'legal', 'medical advice'],
+        'personal': ['my', 'i', 'me', 'personal', 'private']
+    }
+    return [
+        risk_type for risk_type, keywords in risk_signals.items()
+        if any(keyword in query_lower for keyword in keywords)
+    ]
+
+def new_score_result(text: str) -> str:
+    return risk_from_signals(scan_text(text))
+
+# ---------------------------------------------------------------------------
+# Synthetic inputs
+# ---------------------------------------------------------------------------
+
+SENTENCES = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "The process probably evolved in cyanobacteria roughly 2400 million years ago.",
+    "Historians generally agree the empire reached its greatest extent in 117.",
+    "On the other hand, some scholars argue the decline began much earlier.",
+    "About 70% of the surface is covered by water, which shapes the climate.",
+    "The mechanism is still unclear and remains disputed among researchers.",
+    "Prices rose to $300 per unit during the shortage according to records.",
+    "Further study of the mayor's correspondence might reveal more detail.",
+]
+
+QUERIES = [
+    "What is artificial intelligence?",
+    "How does photosynthesis work in plants?",
+    "What is the weather today in Paris?",
+    "Explain the proof of Fermat's last theorem",
+    "Who was Leonardo da Vinci?",
+    "latest stock price news",
+]
+
+def make_text(sentences: int, seed: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+def bench(label: str, fn, inputs, repeat: int = 5) -> float:
+    number = max(1, 2000 // len(inputs))
+    best = min(timeit.repeat(lambda: [fn(x) for x in inputs], number=number, repeat=repeat))
+    per_call_us = best / (number * len(inputs)) * 1e6
+    print(f"   {label:<28} {per_call_us:10.2f} µs/call")
+    return per_call_us
+
+def main():
+    print("⚡ ParaSearch Signal Matching Benchmark")
+    print("=" * 50)
+
+    for sentences in (6, 60, 600):
+        texts = [make_text(sentences, seed) for seed in range(20)]
+        avg_chars = sum(len(t) for t in texts) // len(texts)
+        print(f"\n📄 Result text: {sentences} sentences (~{avg_chars} chars)")
+        old = bench("legacy (2 scans/result)", legacy_score_result, texts)
+        new = bench("matcher (1 scan/result)", new_score_result, texts)
+        print(f"   Speedup: {old / new:.1f}x")
+
+    print("\n🔍 Query risk analysis")
+    old = bench("legacy substring scan", legacy_query_risks, QUERIES)
+    new = bench("compiled alternation", scan_query, QUERIES)
+    print(f"   Speedup: {old / new:.1f}x")
+
+    print("\n🎯 Word-boundary differences (legacy → matcher):")
+    for query in QUERIES:
+        old_risks, new_risks = legacy_query_risks(query), scan_query(query)
+        if old_risks != new_risks:
+            print(f"   '{query}': {old_risks} → {new_risks}")
+
+if __name__ == "__main__":
+    main()
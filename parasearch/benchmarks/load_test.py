@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+ParaSearch Load Test
+Drives /search or /search/stream at a fixed concurrency and reports
+throughput and p50/p95/p99 latency per stage.
+
+With --spawn it starts benchmarks/mock_ollama.py and a backend wired to
+it, so the backend's own overhead can be measured without a GPU. Other
+PARASEARCH_* environment variables are passed through to the spawned
+backend. Results can be saved as a baseline and compared on later runs;
+a comparison exits with status 1 when a stage regresses.
+
+Usage:
+    python benchmarks/load_test.py --spawn --requests 200 --concurrency 8
+    python benchmarks/load_test.py --spawn --save-baseline benchmarks/baselines/search.json
+    python benchmarks/load_test.py --spawn --compare benchmarks/baselines/search.json
+    python benchmarks/load_test.py --url http://localhost:8000 --endpoint stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+# Regressions smaller than this are treated as noise regardless of --tolerance
+NOISE_FLOOR_MS = 5.0
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(samples: List[float]) -> Dict:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2)
+    }
+
+# ---------------------------------------------------------------------------
+# One request per endpoint; each returns stage timings in seconds
+# ---------------------------------------------------------------------------
+
+async def run_search(client: httpx.AsyncClient, payload: Dict) -> Dict[str, float]:
+    started = time.perf_counter()
+    response = await client.post("/search", json=payload)
+    total = time.perf_counter() - started
+    response.raise_for_status()
+    data = response.json()
+    return {"total": total, "server": data["processing_time"]}
+
+async def run_stream(client: httpx.AsyncClient, payload: Dict) -> Dict[str, float]:
+    stages = {}
+    started = time.perf_counter()
+    async with client.stream("POST", "/search/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            elapsed = time.perf_counter() - started
+            if event["type"] == "meta":
+                stages["first_byte"] = elapsed
+            elif event["type"] == "result" and "first_result" not in stages:
+                stages["first_result"] = elapsed
+            elif event["type"] == "error":
+                raise RuntimeError(event.get("detail", "stream error"))
+    stages["total"] = time.perf_counter() - started
+    return stages
+
+ENDPOINTS = {"search": run_search, "stream": run_stream}
+
+# ---------------------------------------------------------------------------
+# Load generator
+# ---------------------------------------------------------------------------
+
+async def run_load(args: argparse.Namespace, backend_url: str, mock_url: Optional[str]) -> Dict:
+    run_one = ENDPOINTS[args.endpoint]
+    stages = defaultdict(list)
+    errors = Counter()
+    issued = 0
+
+    def next_payload() -> Optional[Dict]:
+        nonlocal issued
+        if args.requests and issued >= args.requests:
+            return None
+        issued += 1
+        # Unique queries bypass the result cache unless --distinct-queries limits them
+        n = issued % args.distinct_queries if args.distinct_queries else issued
+        return {
+            "query": f"load test query {n} about parametric search",
+            "model": args.model,
+            "num_results": args.num_results
+        }
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=backend_url, limits=limits, timeout=args.timeout) as client:
+        for i in range(args.warmup):
+            try:
+                await run_one(client, {"query": f"warmup query {i}", "model": args.model,
+                                       "num_results": args.num_results})
+            except Exception as e:
+                print(f"⚠️  Warmup request failed: {e}")
+
+        if mock_url:
+            await client.post(f"{mock_url}/mock/reset")
+
+        deadline = time.perf_counter() + args.duration if args.duration else None
+
+        async def worker():
+            while deadline is None or time.perf_counter() < deadline:
+                payload = next_payload()
+                if payload is None:
+                    return
+                try:
+                    for stage, seconds in (await run_one(client, payload)).items():
+                        stages[stage].append(seconds)
+                except httpx.HTTPStatusError as e:
+                    errors[str(e.response.status_code)] += 1
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        ollama = []
+        if mock_url:
+            ollama = (await client.get(f"{mock_url}/mock/stats")).json()["durations"]
+        server_stats = (await client.get("/stats")).json()
+
+    completed = len(stages["total"])
+    report = {
+        "config": {
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "num_results": args.num_results,
+            "model": args.model,
+            "distinct_queries": args.distinct_queries,
+            "tokens_per_sec": args.tokens_per_sec,
+            "prompt_eval_delay": args.prompt_eval_delay,
+            "failure_rate": args.failure_rate
+        },
+        "completed": completed,
+        "errors": dict(errors),
+        "elapsed": round(elapsed, 3),
+        "throughput": round(completed / elapsed, 3) if elapsed else 0.0,
+        "stages": {stage: summarize(samples) for stage, samples in stages.items()}
+    }
+    if ollama:
+        report["stages"]["ollama"] = summarize(ollama)
+        # What the backend adds on top of generation time, per request on average
+        report["overhead_ms"] = round(report["stages"]["total"]["mean"] - report["stages"]["ollama"]["mean"], 2)
+    report["server"] = {key: server_stats.get(key) for key in ("admission", "cache", "single_flight")}
+    return report
+
+# ---------------------------------------------------------------------------
+# Baselines
+# ---------------------------------------------------------------------------
+
+def error_rate(report: Dict) -> float:
+    failed = sum(report["errors"].values())
+    attempted = report["completed"] + failed
+    return failed / attempted if attempted else 0.0
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Regressions of report against baseline, as human-readable lines"""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        print("⚠️  Baseline was recorded with a different configuration:")
+        print(f"   baseline: {baseline['config']}")
+        print(f"   current:  {report['config']}")
+
+    for stage, old in baseline["stages"].items():
+        new = report["stages"].get(stage)
+        if not new:
+            continue
+        for key in ("p50", "p95"):
+            limit = old[key] * (1 + tolerance)
+            if new[key] > limit and new[key] - old[key] > NOISE_FLOOR_MS:
+                regressions.append(f"{stage} {key}: {old[key]:.1f}ms → {new[key]:.1f}ms")
+
+    if "overhead_ms" in baseline and "overhead_ms" in report:
+        old, new = baseline["overhead_ms"], report["overhead_ms"]
+        if new > old * (1 + tolerance) and new - old > NOISE_FLOOR_MS:
+            regressions.append(f"backend overhead: {old:.1f}ms → {new:.1f}ms")
+
+    old_rate, new_rate = error_rate(baseline), error_rate(report)
+    if new_rate > old_rate + 0.01:
+        regressions.append(f"error rate: {old_rate:.1%} → {new_rate:.1%}")
+
+    if report["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput: {baseline['throughput']:.2f}/s → {report['throughput']:.2f}/s")
+    return regressions
+
+def print_report(report: Dict):
+    print(f"\n📊 {report['completed']} requests in {report['elapsed']:.1f}s "
+          f"({report['throughput']:.2f} req/s)")
+    if report["errors"]:
+        print(f"   ❌ Errors: {report['errors']}")
+    print(f"\n   {'stage':<14} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9}  (ms)")
+    for stage, s in report["stages"].items():
+        print(f"   {stage:<14} {s['p50']:9.1f} {s['p95']:9.1f} {s['p99']:9.1f} {s['mean']:9.1f}")
+    if "overhead_ms" in report:
+        print(f"\n   ⚙️  Backend overhead over generation: {report['overhead_ms']:.1f}ms/request")
+
+# ---------------------------------------------------------------------------
+# Spawned mock Ollama + backend
+# ---------------------------------------------------------------------------
+
+def spawn(args: argparse.Namespace) -> List[subprocess.Popen]:
+    mock = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "mock_ollama.py"),
+        "--port", str(args.mock_port),
+        "--tokens-per-sec", str(args.tokens_per_sec),
+        "--prompt-eval-delay", str(args.prompt_eval_delay),
+        "--failure-rate", str(args.failure_rate),
+        "--models", args.model
+    ])
+    env = dict(os.environ)
+    env.update({
+        "PARASEARCH_OLLAMA_URL": f"http://127.0.0.1:{args.mock_port}",
+        "PARASEARCH_HOST": "127.0.0.1",
+        "PARASEARCH_PORT": str(args.backend_port),
+        "PARASEARCH_MODEL": args.model,
+        # One client generates all the load; don't let the per-IP limit throttle it
+        "PARASEARCH_MAX_REQUESTS": env.get("PARASEARCH_MAX_REQUESTS", "1000000"),
+        "PARASEARCH_HEALTH_INTERVAL": env.get("PARASEARCH_HEALTH_INTERVAL", "1"),
+        # Measure backend overhead rather than admission queueing, unless asked otherwise
+        "PARASEARCH_MODEL_CONCURRENCY": env.get("PARASEARCH_MODEL_CONCURRENCY", str(args.concurrency))
+    })
+    backend = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "backend", "main.py")],
+        env=env, stdout=subprocess.DEVNULL
+    )
+    return [mock, backend]
+
+async def wait_until_healthy(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health")).json().get("status") == "healthy":
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Backend at {url} did not become healthy within {timeout:.0f}s")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ParaSearch load test")
+    parser.add_argument("--url", default="http://localhost:8000", help="backend URL (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start a mock Ollama and a backend for the run")
+    parser.add_argument("--mock-url", help="mock Ollama URL, to report generation time and overhead")
+    parser.add_argument("--endpoint", choices=sorted(ENDPOINTS), default="search")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="total requests (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--num-results", type=int, default=5)
+    parser.add_argument("--model", default="qwen2.5-coder:3b")
+    parser.add_argument("--distinct-queries", type=int, default=0,
+                        help="cycle through this many queries (0 = every query unique)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the report as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+
+    mock = parser.add_argument_group("spawned mock Ollama")
+    mock.add_argument("--mock-port", type=int, default=11435)
+    mock.add_argument("--backend-port", type=int, default=8765)
+    mock.add_argument("--tokens-per-sec", type=float, default=500.0)
+    mock.add_argument("--prompt-eval-delay", type=float, default=0.05)
+    mock.add_argument("--failure-rate", type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+    if not args.requests and not args.duration:
+        parser.error("set --requests or --duration")
+    return args
+
+def main():
+    args = parse_args()
+    print("🚀 ParaSearch Load Test")
+    print("=" * 50)
+
+    processes = []
+    backend_url, mock_url = args.url, args.mock_url
+    try:
+        if args.spawn:
+            processes = spawn(args)
+            backend_url = f"http://127.0.0.1:{args.backend_port}"
+            mock_url = f"http://127.0.0.1:{args.mock_port}"
+            asyncio.run(wait_until_healthy(backend_url))
+            if any(process.poll() is not None for process in processes):
+                raise RuntimeError("A spawned server exited early (is --mock-port or --backend-port in use?)")
+        print(f"   Target: {backend_url}/{'search' if args.endpoint == 'search' else 'search/stream'}")
+        print(f"   Concurrency: {args.concurrency}, model: {args.model}, results: {args.num_results}")
+
+        report = asyncio.run(run_load(args, backend_url, mock_url))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    print_report(report)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressions against {args.compare} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
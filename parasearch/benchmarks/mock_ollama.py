@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+ParaSearch Mock Ollama Server
+A stand-in for Ollama that serves canned RESULT-formatted output at a
+configurable speed, so the backend can be load tested without a GPU.
+
+Implements /api/tags, /api/generate (streaming and non-streaming) and
+/api/embed with Ollama's response fields and timing stats. GET /mock/stats reports
+what the mock served; POST /mock/reset clears it.
+
+Usage:
+    python benchmarks/mock_ollama.py --port 11435 --tokens-per-sec 80
+    PARASEARCH_OLLAMA_URL=http://localhost:11435 python backend/main.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_MODELS = ["qwen2.5-coder:3b", "llama3.2:latest", "mistral:latest"]
+
+TOPICS = [
+    "core principles", "historical background", "practical applications",
+    "common misconceptions", "recent research directions", "key terminology",
+    "comparison with related ideas", "open questions", "measurement and evidence",
+    "notable examples"
+]
+
+SENTENCES = [
+    "It is described consistently across standard reference material.",
+    "The underlying mechanism has been studied for several decades.",
+    "Specialists generally agree on the main points, though details vary.",
+    "Introductory textbooks usually cover it in the first few chapters.",
+    "Some aspects are still debated and should be checked against sources.",
+    "Practical use depends heavily on the surrounding context.",
+]
+
+NUM_RESULTS_PATTERN = re.compile(r"Generate exactly (\d+)")
+EXPAND_PATTERN = re.compile(r'Write the EXPANDED text for the result titled "(.*)"')
+MORE_PATTERN = re.compile(r"Continue with (\d+) more search results(?: .* numbered from RESULT (\d+))?")
+SHOWN_PATTERN = re.compile(r"already shown.*:\n((?:- .*\n?)+)")
+
+EMBEDDING_DIM = 64
+
+
+@dataclass
+class MockConfig:
+    models: List[str] = field(default_factory=lambda: list(DEFAULT_MODELS))
+    tokens_per_sec: float = 50.0     # generation speed
+    prompt_eval_delay: float = 0.2   # seconds before the first token
+    load_delay: float = 0.0          # extra delay on a model's first generation
+    failure_rate: float = 0.0        # fraction of generations answered with HTTP 500
+    slow_rate: float = 0.0           # fraction of generations stalled before the first token
+    slow_delay: float = 2.0          # extra seconds a stalled generation waits
+    results: int = 5                 # results generated when the prompt does not say
+    extra_results: int = 0           # results generated beyond what the prompt asks for
+    format_support: bool = True      # accept a JSON schema as "format" (Ollama 0.5+)
+    weak_models: List[str] = field(default_factory=list)  # models that rate their results low
+    seed: int = 0
+
+
+def canned_results(query: str, num_results: int, rng: random.Random, weak: bool = False,
+                   expanded: bool = True, first: int = 1) -> List[Dict]:
+    results = []
+    for i in range(first, first + num_results):
+        result = {
+            "title": f"{query.strip() or 'Query'}: {TOPICS[(i - 1) % len(TOPICS)]}",
+            "snippet": " ".join(rng.sample(SENTENCES, 2)),
+            "relevance_score": max(1, (4 if weak else 10) - i // 2)
+        }
+        if expanded:
+            result["expanded_content"] = " ".join(rng.sample(SENTENCES, 4))
+        results.append(result)
+    return results
+
+
+def canned_output(query: str, num_results: int, rng: random.Random, weak: bool = False,
+                  expanded: bool = True, first: int = 1) -> str:
+    """RESULT-formatted text in the layout the backend prompt asks for"""
+    return "".join(
+        f"RESULT {i}\n"
+        f"TITLE: {r['title']}\n"
+        f"SNIPPET: {r['snippet']}\n"
+        f"RELEVANCE: {r['relevance_score']}\n"
+        + (f"EXPANDED: {r['expanded_content']}\n" if expanded else "")
+        + "---\n\n"
+        for i, r in enumerate(canned_results(query, num_results, rng, weak, expanded, first), first)
+    )
+
+
+def canned_json(query: str, num_results: int, rng: random.Random, weak: bool = False,
+                expanded: bool = True, first: int = 1) -> str:
+    """Output for a request with a JSON schema as format"""
+    return json.dumps({"results": canned_results(query, num_results, rng, weak, expanded, first)}, indent=2)
+
+
+def canned_expansion(rng: random.Random) -> str:
+    """Output for a request to expand a single result"""
+    return " ".join(rng.sample(SENTENCES, 4))
+
+
+def embed(text: str) -> List[float]:
+    """
+    Hashed bag-of-words vector: deterministic, and texts sharing most
+    words come out close, which is enough to exercise a semantic cache
+    """
+    vector = [0.0] * EMBEDDING_DIM
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode()).digest()
+        vector[digest[0] % EMBEDDING_DIM] += 1.0 if digest[1] % 2 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def tokenize(text: str) -> List[str]:
+    # Roughly one token per word, keeping whitespace so chunks rejoin exactly
+    return re.findall(r"\s*\S+|\s+$", text)
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="Mock Ollama")
+    rng = random.Random(config.seed)
+    loaded = set()
+    # The query and next result number behind each context handed out; a
+    # context's first token is its id here
+    contexts: Dict[int, Dict] = {}
+    stats: Dict = {"generations": 0, "failures": 0, "cancelled": 0, "tokens": 0, "embeddings": 0,
+                   "context_reuses": 0, "in_flight": 0, "max_in_flight": 0, "durations": []}
+
+    def resolve(model: str) -> str:
+        if ":" not in model and f"{model}:latest" in config.models:
+            return f"{model}:latest"  # Ollama resolves untagged names to :latest
+        return model
+
+    def reset():
+        stats.update(generations=0, failures=0, cancelled=0, tokens=0, embeddings=0, context_reuses=0,
+                     max_in_flight=stats["in_flight"], durations=[])
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name, "model": name, "size": 0} for name in config.models]}
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return stats
+
+    @app.post("/mock/reset")
+    async def mock_reset():
+        reset()
+        return {"status": "reset"}
+
+    @app.post("/api/embed")
+    async def embeddings(request: Request):
+        body = await request.json()
+        model = resolve(body.get("model", ""))
+        if model not in config.models:
+            return JSONResponse(status_code=404, content={"error": f"model '{model}' not found"})
+        inputs = body.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        stats["embeddings"] += len(inputs)
+        return {"model": model, "embeddings": [embed(text) for text in inputs]}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        model = resolve(body.get("model", ""))
+        if model not in config.models:
+            return JSONResponse(status_code=404, content={"error": f"model '{model}' not found"})
+        if rng.random() < config.failure_rate:
+            stats["failures"] += 1
+            return JSONResponse(status_code=500, content={"error": "mock generation failure"})
+
+        output_format = body.get("format")
+        if isinstance(output_format, dict) and not config.format_support:
+            return JSONResponse(status_code=400, content={"error": "invalid format"})
+
+        prompt = body.get("prompt", "")
+        match = NUM_RESULTS_PATTERN.search(prompt)
+        query_match = re.search(r'User Query: "(.*)"', prompt)
+        more_match = MORE_PATTERN.search(prompt)
+        num_results = (int(match.group(1)) if match else config.results) + config.extra_results
+        query = query_match.group(1) if query_match else ""
+        # A first page starts at result 1, or after the titles the prompt says were already shown
+        shown_match = SHOWN_PATTERN.search(prompt)
+        first = (shown_match.group(1).count("\n- ") + 2) if shown_match else 1
+        continued = contexts.get((body.get("context") or [None])[0])
+        if more_match and continued:
+            num_results = int(more_match.group(1)) + config.extra_results
+            query = continued["query"]
+            first = int(more_match.group(2)) if more_match.group(2) else continued["next"]
+        if EXPAND_PATTERN.search(prompt):
+            output = canned_expansion(rng)
+        else:
+            # Lightweight prompts leave EXPANDED out of the format
+            expanded = ("EXPANDED: [" in prompt or '"expanded_content"' in prompt
+                        or bool(more_match and "EXPANDED" not in prompt and "expanded_content" not in prompt))
+            render = canned_json if output_format else canned_output
+            output = render(query, num_results, rng, model in config.weak_models, expanded, first)
+        tokens = tokenize(output)
+        num_predict = (body.get("options") or {}).get("num_predict")
+        if num_predict and num_predict > 0:
+            tokens = tokens[:num_predict]
+
+        load_delay = 0.0 if model in loaded else config.load_delay
+        # A stall (GC pause, model swap, busy GPU) delays the first token
+        stall = config.slow_delay if rng.random() < config.slow_rate else 0.0
+        loaded.add(model)
+        prompt_tokens = (len(body.get("system", "")) + len(prompt)) // 4
+        if body.get("context"):
+            # Ollama continues the given context and only evaluates the new prompt
+            stats["context_reuses"] += 1
+
+        def final(started: float, first_token: float) -> Dict:
+            now = time.monotonic()
+            context_id = len(contexts) + 1
+            contexts[context_id] = {"query": query, "next": first + num_results}
+            return {
+                "model": model,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": "",
+                "done": True,
+                "done_reason": "stop" if not num_predict or len(tokens) < num_predict else "length",
+                "context": [context_id] + list(range(min(prompt_tokens + len(tokens), 64))),
+                "total_duration": int((now - started) * 1e9),
+                "load_duration": int(load_delay * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int(config.prompt_eval_delay * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((now - first_token) * 1e9)
+            }
+
+        async def produce():
+            """Yield tokens on the configured schedule"""
+            started = time.monotonic()
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+            try:
+                await asyncio.sleep(load_delay + stall + config.prompt_eval_delay)
+                first_token = time.monotonic()
+                for i, token in enumerate(tokens):
+                    # Sleep to the token's due time rather than a fixed interval per token
+                    delay = first_token + (i + 1) / config.tokens_per_sec - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    stats["tokens"] += 1
+                    yield token
+                stats["generations"] += 1
+                stats["durations"].append(round(time.monotonic() - started, 4))
+                yield final(started, first_token)
+            except (asyncio.CancelledError, GeneratorExit):
+                # The client disconnected mid-stream, as Ollama sees a cancelled request
+                stats["cancelled"] += 1
+                raise
+            finally:
+                stats["in_flight"] -= 1
+
+        if not body.get("stream", True):
+            text, result = [], {}
+            async for item in produce():
+                if isinstance(item, dict):
+                    result = item
+                else:
+                    text.append(item)
+            result["response"] = "".join(text)
+            return result
+
+        async def stream():
+            async for item in produce():
+                if isinstance(item, dict):
+                    yield json.dumps(item) + "\n"
+                else:
+                    yield json.dumps({"model": model, "response": item, "done": False}) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mock Ollama server for ParaSearch load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default=",".join(DEFAULT_MODELS), help="comma-separated model names")
+    parser.add_argument("--tokens-per-sec", type=float, default=50.0)
+    parser.add_argument("--prompt-eval-delay", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--load-delay", type=float, default=0.0, help="extra delay on a model's first generation")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of generations that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0,
+                        help="fraction of generations stalled before the first token")
+    parser.add_argument("--slow-delay", type=float, default=2.0, help="seconds a stalled generation waits")
+    parser.add_argument("--results", type=int, default=5, help="results when the prompt does not specify")
+    parser.add_argument("--extra-results", type=int, default=0,
+                        help="results generated beyond what the prompt asks for")
+    parser.add_argument("--no-format-support", action="store_true",
+                        help="reject JSON schema formats like Ollama before 0.5")
+    parser.add_argument("--weak-models", default="",
+                        help="comma-separated models that rate their results low, to exercise the cascade")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main():
+    import uvicorn
+    args = parse_args()
+    config = MockConfig(
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        tokens_per_sec=args.tokens_per_sec,
+        prompt_eval_delay=args.prompt_eval_delay,
+        load_delay=args.load_delay,
+        failure_rate=args.failure_rate,
+        slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay,
+        results=args.results,
+        extra_results=args.extra_results,
+        format_support=not args.no_format_support,
+        weak_models=[m.strip() for m in args.weak_models.split(",") if m.strip()],
+        seed=args.seed
+    )
+    print(f"🧪 Mock Ollama on http://{args.host}:{args.port}")
+    print(f"   {config.tokens_per_sec:g} tokens/s, {config.prompt_eval_delay:g}s prompt eval, "
+          f"{config.failure_rate:.0%} failures")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
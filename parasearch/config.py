@@ -7,15 +7,104 @@ import os
 
 # Ollama Configuration
 OLLAMA_URL = os.getenv("PARASEARCH_OLLAMA_URL", "http://localhost:11434")
+# Comma-separated list of backends, e.g. "http://gpu1:11434,http://gpu2:11434"
+OLLAMA_URLS = [url.strip().rstrip("/") for url in OLLAMA_URL.split(",") if url.strip()]
 DEFAULT_MODEL = os.getenv("PARASEARCH_MODEL", "qwen2.5-coder:3b")
+OLLAMA_KEEP_ALIVE = os.getenv("PARASEARCH_OLLAMA_KEEP_ALIVE", "30m")  # keep model + prompt cache resident
+
+# Ollama Connection Pool
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("PARASEARCH_OLLAMA_MAX_CONNECTIONS", "100"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("PARASEARCH_OLLAMA_MAX_KEEPALIVE", "20"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("PARASEARCH_OLLAMA_KEEPALIVE_EXPIRY", "30"))  # seconds
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("PARASEARCH_OLLAMA_CONNECT_TIMEOUT", "5"))  # seconds
+OLLAMA_READ_TIMEOUT = float(os.getenv("PARASEARCH_OLLAMA_READ_TIMEOUT", "30"))  # seconds
+OLLAMA_HEALTH_TIMEOUT = float(os.getenv("PARASEARCH_OLLAMA_HEALTH_TIMEOUT", "5"))  # seconds
+
+# Health Monitoring & Circuit Breaker
+HEALTH_CHECK_INTERVAL = float(os.getenv("PARASEARCH_HEALTH_INTERVAL", "10"))  # seconds
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("PARASEARCH_CIRCUIT_FAILURES", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("PARASEARCH_CIRCUIT_RESET", "30"))  # seconds
 
 # Server Configuration
 BACKEND_HOST = os.getenv("PARASEARCH_HOST", "0.0.0.0")
 BACKEND_PORT = int(os.getenv("PARASEARCH_PORT", "8000"))
+BACKEND_WORKERS = int(os.getenv("PARASEARCH_WORKERS", "1"))
+
+# Shared State ("memory" = per process, "sqlite" = shared by all workers on this host)
+STATE_BACKEND = os.getenv("PARASEARCH_STATE_BACKEND", "memory").lower()
+STATE_DB_PATH = os.getenv("PARASEARCH_STATE_DB", "parasearch_state.db")
 
 # Rate Limiting
 RATE_LIMIT_WINDOW = int(os.getenv("PARASEARCH_RATE_WINDOW", "60"))  # seconds
 MAX_REQUESTS_PER_WINDOW = int(os.getenv("PARASEARCH_MAX_REQUESTS", "20"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("PARASEARCH_RATE_MAX_CLIENTS", "10000"))  # tracked IPs
+
+# Request deadlines: clients may ask for a shorter or longer budget with an
+# X-Request-Timeout header (seconds), capped at REQUEST_TIMEOUT_MAX
+REQUEST_TIMEOUT = float(os.getenv("PARASEARCH_REQUEST_TIMEOUT", "60"))  # seconds
+REQUEST_TIMEOUT_MAX = float(os.getenv("PARASEARCH_REQUEST_TIMEOUT_MAX", "120"))  # seconds
+
+# Admission Control: slots are per backend serving the model and per worker
+# process, so with N workers each backend may see N times this many generations
+MODEL_CONCURRENCY = int(os.getenv("PARASEARCH_MODEL_CONCURRENCY", "2"))  # generations per model per backend
+# Per-model overrides, e.g. "mistral=1,llama3.2=4"
+MODEL_CONCURRENCY_OVERRIDES = {
+    name.strip(): int(limit)
+    for name, _, limit in (
+        item.rpartition("=") for item in os.getenv("PARASEARCH_MODEL_CONCURRENCY_OVERRIDES", "").split(",")
+    )
+    if name.strip()
+}
+QUEUE_MAX_SIZE = int(os.getenv("PARASEARCH_QUEUE_MAX_SIZE", "20"))  # waiting requests per model
+QUEUE_MAX_WAIT = float(os.getenv("PARASEARCH_QUEUE_MAX_WAIT", "15"))  # seconds
+
+# Hedged Requests: with several Ollama backends, a generation with no first
+# token after the HEDGE_PERCENTILE of recent first-token times is also sent to
+# another backend; the first to answer wins. Hedges are capped at
+# HEDGE_MAX_FRACTION of recent generations.
+HEDGE_ENABLED = os.getenv("PARASEARCH_HEDGE", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("PARASEARCH_HEDGE_PERCENTILE", "0.9"))
+HEDGE_MAX_FRACTION = float(os.getenv("PARASEARCH_HEDGE_MAX_FRACTION", "0.1"))
+HEDGE_MIN_SAMPLES = int(os.getenv("PARASEARCH_HEDGE_MIN_SAMPLES", "20"))  # timings before hedging starts
+HEDGE_WINDOW = int(os.getenv("PARASEARCH_HEDGE_WINDOW", "200"))  # recent generations considered
+
+# Batch Search
+BATCH_MAX_QUERIES = int(os.getenv("PARASEARCH_BATCH_MAX_QUERIES", "1000"))
+BATCH_DEFAULT_PARALLELISM = int(os.getenv("PARASEARCH_BATCH_PARALLELISM", "4"))
+BATCH_MAX_PARALLELISM = int(os.getenv("PARASEARCH_BATCH_MAX_PARALLELISM", "16"))
+BATCH_MAX_RETRIES = int(os.getenv("PARASEARCH_BATCH_MAX_RETRIES", "5"))  # per query, on 503
+BATCH_MAX_RETRY_DELAY = float(os.getenv("PARASEARCH_BATCH_MAX_RETRY_DELAY", "10"))  # seconds
+# Unique batch queries each client may run per PARASEARCH_RATE_WINDOW, separate from
+# the interactive limit; a batch over its quota slows down rather than failing
+BATCH_MAX_QUERIES_PER_WINDOW = int(os.getenv("PARASEARCH_BATCH_MAX_REQUESTS", "120"))
+
+# Result Cache
+CACHE_ENABLED = os.getenv("PARASEARCH_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = float(os.getenv("PARASEARCH_CACHE_TTL", "3600"))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("PARASEARCH_CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("PARASEARCH_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+CACHE_DB_PATH = os.getenv("PARASEARCH_CACHE_DB", "")  # empty = memory only
+
+# Semantic Cache: serve near-duplicate queries from cache, matched by the cosine
+# similarity of their Ollama embeddings (same model and generation settings only)
+SEMANTIC_CACHE_ENABLED = os.getenv("PARASEARCH_SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_MODEL = os.getenv("PARASEARCH_EMBED_MODEL", "nomic-embed-text")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("PARASEARCH_SEMANTIC_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("PARASEARCH_SEMANTIC_MAX_ENTRIES", "10000"))
+SEMANTIC_CACHE_INDEX = os.getenv("PARASEARCH_SEMANTIC_INDEX", "flat").lower()  # "flat" or "ivf"
+SEMANTIC_CACHE_IVF_MIN_ENTRIES = int(os.getenv("PARASEARCH_SEMANTIC_IVF_MIN_ENTRIES", "5000"))
+SEMANTIC_CACHE_IVF_PROBES = int(os.getenv("PARASEARCH_SEMANTIC_IVF_PROBES", "4"))  # clusters scanned per lookup
+SEMANTIC_CACHE_DB_PATH = os.getenv("PARASEARCH_SEMANTIC_CACHE_DB", "")  # empty = same file as the result cache
+EMBED_TIMEOUT = float(os.getenv("PARASEARCH_EMBED_TIMEOUT", "2"))  # seconds
+
+# Query Suggestions: /suggest completes a typed prefix from previously served
+# queries, most searched first; counts persist in a query log. Off by default,
+# since it shows other users' queries.
+SUGGEST_ENABLED = os.getenv("PARASEARCH_SUGGEST", "false").lower() == "true"
+SUGGEST_MAX_ENTRIES = int(os.getenv("PARASEARCH_SUGGEST_MAX_ENTRIES", "20000"))  # distinct queries indexed
+SUGGEST_MAX_RESULTS = int(os.getenv("PARASEARCH_SUGGEST_MAX_RESULTS", "8"))  # per prefix
+SUGGEST_MIN_COUNT = int(os.getenv("PARASEARCH_SUGGEST_MIN_COUNT", "3"))  # distinct clients before a query is suggested
+SUGGEST_DB_PATH = os.getenv("PARASEARCH_SUGGEST_DB", "")  # empty = same file as the result cache
 
 # Model Configuration
 RECOMMENDED_MODELS = [
@@ -25,9 +114,56 @@ RECOMMENDED_MODELS = [
     "llama3.1",    # Alternative 3B option
 ]
 
+# Model warm-up: at startup, load DEFAULT_MODEL plus PRELOAD_MODELS on every backend
+# and evaluate the system prompt once, so the first searches don't pay the load time.
+# "recommended" in the list expands to RECOMMENDED_MODELS.
+WARMUP_ENABLED = os.getenv("PARASEARCH_WARMUP", "true").lower() == "true"
+def _model_list(value: str) -> list:
+    models = []
+    for name in (n.strip() for n in value.split(",")):
+        for model in (RECOMMENDED_MODELS if name == "recommended" else [name] if name else []):
+            if model not in models:
+                models.append(model)
+    return models
+
+PRELOAD_MODELS = _model_list(os.getenv("PARASEARCH_PRELOAD_MODELS", ""))
+WARMUP_TIMEOUT = float(os.getenv("PARASEARCH_WARMUP_TIMEOUT", "300"))  # seconds per model load
+WARMUP_RETRY_INTERVAL = float(os.getenv("PARASEARCH_WARMUP_RETRY", "60"))  # seconds before retrying a failed warm-up
+# keep_alive for warmed-up models; negative keeps them loaded until Ollama restarts
+PRELOAD_KEEP_ALIVE = os.getenv("PARASEARCH_PRELOAD_KEEP_ALIVE", "-1m")
+
+# Model cascade: searches sent with "cascade": true start on the first of these models
+# and move to the next only when the answer looks unreliable (smallest model first)
+CASCADE_MODELS = _model_list(os.getenv("PARASEARCH_CASCADE_MODELS", ""))
+CASCADE_MIN_CONFIDENCE = float(os.getenv("PARASEARCH_CASCADE_MIN_CONFIDENCE", "0.6"))  # average result confidence
+CASCADE_ESCALATE_RISK = os.getenv("PARASEARCH_CASCADE_ESCALATE_RISK", "high").lower()  # "medium" or "high"
+
 # Search Configuration
 DEFAULT_NUM_RESULTS = int(os.getenv("PARASEARCH_DEFAULT_RESULTS", "5"))
 DEFAULT_TEMPERATURE = float(os.getenv("PARASEARCH_DEFAULT_TEMP", "0.3"))
+# Generation budget (Ollama num_predict): tokens per requested result plus a fixed
+# allowance; 0 tokens per result leaves generation unbounded
+TOKENS_PER_RESULT = int(os.getenv("PARASEARCH_TOKENS_PER_RESULT", "300"))
+TOKEN_BUDGET_OVERHEAD = int(os.getenv("PARASEARCH_TOKEN_BUDGET_OVERHEAD", "50"))
+# Lightweight searches leave out EXPANDED text, which /expand generates on demand
+LIGHT_TOKENS_PER_RESULT = int(os.getenv("PARASEARCH_LIGHT_TOKENS_PER_RESULT", "120"))
+EXPAND_MAX_TOKENS = int(os.getenv("PARASEARCH_EXPAND_MAX_TOKENS", "300"))
+# Generated expansions each client may request per PARASEARCH_RATE_WINDOW, separate
+# from the search limit so opening results doesn't use up searches; cache hits are free
+EXPAND_MAX_REQUESTS_PER_WINDOW = int(os.getenv("PARASEARCH_EXPAND_MAX_REQUESTS", "60"))
+# Ollama contexts of recent searches, kept so /expand and /search/more can continue them
+CONTEXT_TTL = float(os.getenv("PARASEARCH_CONTEXT_TTL", "900"))  # seconds
+CONTEXT_MAX_ENTRIES = int(os.getenv("PARASEARCH_CONTEXT_MAX_ENTRIES", "500"))
+# "More results" cursors: each holds a search's settings, served titles and Ollama context
+CURSOR_TTL = float(os.getenv("PARASEARCH_CURSOR_TTL", "1800"))  # seconds
+CURSOR_MAX_ENTRIES = int(os.getenv("PARASEARCH_CURSOR_MAX_ENTRIES", "1000"))
+# Ask Ollama for JSON matching a schema (format parameter) instead of the text layout
+STRUCTURED_OUTPUT = os.getenv("PARASEARCH_STRUCTURED_OUTPUT", "false").lower() == "true"
+# Consecutive undecodable JSON outputs before a model falls back to the text layout
+STRUCTURED_OUTPUT_MAX_FAILURES = int(os.getenv("PARASEARCH_STRUCTURED_MAX_FAILURES", "3"))
+# Seconds before structured output is tried again on a backend that rejected the
+# schema, or for a model switched to the text layout after decode failures
+STRUCTURED_OUTPUT_RETRY = float(os.getenv("PARASEARCH_STRUCTURED_RETRY", "600"))
 
 # Guardrails Configuration
 ENABLE_ENHANCED_GUARDRAILS = os.getenv("PARASEARCH_ENABLE_GUARDRAILS", "true").lower() == "true"
@@ -44,14 +180,50 @@ CORS_ORIGINS = os.getenv("PARASEARCH_CORS_ORIGINS", "*").split(",")
 def get_config_summary():
     """Return a summary of current configuration"""
     return {
-        "ollama_url": OLLAMA_URL,
+        "ollama_urls": OLLAMA_URLS,
         "default_model": DEFAULT_MODEL,
+        "ollama_keep_alive": OLLAMA_KEEP_ALIVE,
+        "ollama_max_connections": OLLAMA_MAX_CONNECTIONS,
+        "ollama_max_keepalive": OLLAMA_MAX_KEEPALIVE,
+        "ollama_keepalive_expiry": OLLAMA_KEEPALIVE_EXPIRY,
+        "ollama_connect_timeout": OLLAMA_CONNECT_TIMEOUT,
+        "ollama_read_timeout": OLLAMA_READ_TIMEOUT,
+        "health_check_interval": HEALTH_CHECK_INTERVAL,
+        "circuit_failure_threshold": CIRCUIT_FAILURE_THRESHOLD,
+        "circuit_reset_timeout": CIRCUIT_RESET_TIMEOUT,
         "backend_host": BACKEND_HOST,
         "backend_port": BACKEND_PORT,
+        "backend_workers": BACKEND_WORKERS,
+        "state_backend": STATE_BACKEND,
         "rate_limit_window": RATE_LIMIT_WINDOW,
         "max_requests_per_window": MAX_REQUESTS_PER_WINDOW,
+        "rate_limit_max_clients": RATE_LIMIT_MAX_CLIENTS,
+        "model_concurrency": MODEL_CONCURRENCY,
+        "model_concurrency_overrides": MODEL_CONCURRENCY_OVERRIDES,
+        "request_timeout": REQUEST_TIMEOUT,
+        "request_timeout_max": REQUEST_TIMEOUT_MAX,
+        "queue_max_size": QUEUE_MAX_SIZE,
+        "queue_max_wait": QUEUE_MAX_WAIT,
+        "hedge_enabled": HEDGE_ENABLED,
+        "batch_max_queries": BATCH_MAX_QUERIES,
+        "batch_max_parallelism": BATCH_MAX_PARALLELISM,
+        "cache_enabled": CACHE_ENABLED,
+        "cache_ttl": CACHE_TTL,
+        "cache_max_entries": CACHE_MAX_ENTRIES,
+        "cache_db_path": CACHE_DB_PATH,
+        "semantic_cache_enabled": SEMANTIC_CACHE_ENABLED,
+        "semantic_cache_model": SEMANTIC_CACHE_MODEL,
+        "suggest_enabled": SUGGEST_ENABLED,
+        "suggest_min_count": SUGGEST_MIN_COUNT,
+        "warmup_enabled": WARMUP_ENABLED,
+        "preload_models": PRELOAD_MODELS,
+        "warmup_retry_interval": WARMUP_RETRY_INTERVAL,
+        "cascade_models": CASCADE_MODELS,
         "default_num_results": DEFAULT_NUM_RESULTS,
         "default_temperature": DEFAULT_TEMPERATURE,
+        "tokens_per_result": TOKENS_PER_RESULT,
+        "light_tokens_per_result": LIGHT_TOKENS_PER_RESULT,
+        "structured_output": STRUCTURED_OUTPUT,
         "enhanced_guardrails": ENABLE_ENHANCED_GUARDRAILS,
         "log_level": LOG_LEVEL,
         "cors_origins": CORS_ORIGINS
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+ParaSearch Backend Tests
+Unit tests for backend components that need no Ollama (run with pytest)
+"""
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from hedging import HedgePolicy
+
+
+def test_hedge_cap_holds_for_concurrent_generations():
+    """Hedges granted to generations racing at the same time stay under max_fraction"""
+    policy = HedgePolicy(max_fraction=0.1, window=1000)
+    for _ in range(50):
+        policy.record(False)
+    rng = random.Random(7)
+
+    async def generation() -> bool:
+        await asyncio.sleep(rng.random() * 0.01)
+        hedged = policy.allow()
+        await asyncio.sleep(rng.random() * 0.05)
+        policy.record(hedged)
+        return hedged
+
+    async def burst():
+        return await asyncio.gather(*(generation() for _ in range(300)))
+
+    hedged = sum(asyncio.run(burst()))
+    assert hedged > 0
+    assert hedged <= policy.max_fraction * policy.generations
+    assert policy.stats()["hedges_in_flight"] == 0
+
+
+def test_hedge_reservations_block_simultaneous_checks():
+    """Checks made before any race finishes share one budget"""
+    policy = HedgePolicy(max_fraction=0.1, window=1000)
+    for _ in range(100):
+        policy.record(False)
+    granted = sum(policy.allow() for _ in range(12))
+    assert granted / (100 + granted) <= 0.1
+
+
+def test_batch_stream_finishes_when_a_search_raises(monkeypatch):
+    """A search failing with something other than HTTPException still gets its error line"""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    async def run_search(query_data, with_cursor=True):
+        if query_data.query == "boom":
+            raise sqlite3.OperationalError("database is locked")
+        return main.SearchResponse(query=query_data.query, results=[], processing_time=0.0,
+                                   model_used=query_data.model, knowledge_cutoff=main.KNOWLEDGE_CUTOFF)
+
+    monkeypatch.setattr(main, "run_search", run_search)
+    response = TestClient(main.app).post("/search/batch", json={
+        "queries": [{"query": "first"}, {"query": "boom"}, {"query": "last"}]
+    })
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert lines[-1]["type"] == "done"
+    by_index = {line["index"]: line for line in lines[:-1]}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[1]["type"] == "error" and by_index[1]["status"] == 500
+    assert by_index[0]["type"] == by_index[2]["type"] == "result"